@@ -0,0 +1,161 @@
+"""
+Micro-benchmark: legacy split-based SSE parser vs incremental SSEDecoder
+Usage:
+    python bench_sse_parser.py                      # synthetic streams
+    python bench_sse_parser.py recorded_stream.txt  # also benchmark recorded raw SSE bodies
+"""
+import sys
+import re
+import json
+import time
+import tracemalloc
+
+from integrated_test_comparison import SSEDecoder, SSEResponseBuilder, parse_sse_response
+
+CHUNK_SIZE = 4096  # Bytes per network read when simulating a streamed body
+REPEATS = 5
+
+def legacy_parse_sse_response(response_text):
+    """parse_sse_response as it was before the incremental decoder (kept for comparison)"""
+    content_parts = []
+    extracted_urls = []
+
+    for line in response_text.split('\n'):
+        line = line.strip()
+        if line.startswith('data: '):
+            try:
+                json_part = line[6:].strip()
+                if json_part and json_part != '[DONE]':
+                    data_obj = json.loads(json_part)
+
+                    if isinstance(data_obj, dict):
+                        if 'assistant_output' in data_obj and data_obj['assistant_output']:
+                            output = str(data_obj['assistant_output'])
+                            if not any(emoji in output for emoji in ['🔄', '🔧', '📋', '🔍', '📂', '🤔', '📚', '✨']):
+                                content_parts.append(output)
+
+                        elif 'data' in data_obj and isinstance(data_obj['data'], dict):
+                            chunk_data = data_obj['data']
+
+                            if 'assistant_output' in chunk_data and chunk_data['assistant_output']:
+                                content_parts.append(str(chunk_data['assistant_output']))
+                            elif 'content' in chunk_data and chunk_data['content']:
+                                content_parts.append(str(chunk_data['content']))
+
+                            if 'sources' in chunk_data and isinstance(chunk_data['sources'], list):
+                                for source in chunk_data['sources']:
+                                    if isinstance(source, dict):
+                                        for url_field in ['page_url', 'url', 'link', 'source_url']:
+                                            if url_field in source and source[url_field]:
+                                                extracted_urls.append(source[url_field])
+                                                break
+
+                        elif 'content' in data_obj and data_obj['content']:
+                            content_parts.append(str(data_obj['content']))
+
+                        if 'sources' in data_obj and isinstance(data_obj['sources'], list):
+                            for source in data_obj['sources']:
+                                if isinstance(source, dict):
+                                    for url_field in ['page_url', 'url', 'link', 'source_url']:
+                                        if url_field in source and source[url_field]:
+                                            extracted_urls.append(source[url_field])
+                                            break
+            except json.JSONDecodeError:
+                continue
+
+    text_content = ''.join(content_parts)
+
+    if not text_content:
+        text_content = "SSE response: No content extracted"
+
+    if not extracted_urls and text_content:
+        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
+        content_urls = re.findall(url_pattern, text_content + response_text)
+        extracted_urls.extend(content_urls[:5])
+
+    unique_urls = list(dict.fromkeys(extracted_urls))
+
+    return {'status': 'success', 'response': text_content, 'sources': unique_urls[:10]}
+
+def make_stream(token_count, with_sources=True):
+    """Build a synthetic mentor SSE body: status chunks, token chunks, then sources"""
+    lines = []
+    for status in ['🔄 Initializing...', '🔍 Searching knowledge base...', '📚 Reading documents...']:
+        lines.append('data: ' + json.dumps({'assistant_output': status}))
+        lines.append('')
+    for i in range(token_count):
+        text = f"token{i % 97} value-stream flow "
+        if i % 500 == 0:
+            text += f"see https://kata.example.com/guide/{i % 7} "
+        lines.append('data: ' + json.dumps({'assistant_output': text}))
+        lines.append('')
+    if with_sources:
+        sources = [{'page_url': f"https://kata.example.com/docs/page-{i}"} for i in range(8)]
+        lines.append('data: ' + json.dumps({'sources': sources}))
+        lines.append('')
+    lines.append('data: [DONE]')
+    lines.append('')
+    return '\n'.join(lines)
+
+def decode_streamed(body_bytes):
+    """Feed the body to SSEDecoder in CHUNK_SIZE pieces, like a network read loop"""
+    decoder = SSEDecoder()
+    builder = SSEResponseBuilder()
+    for offset in range(0, len(body_bytes), CHUNK_SIZE):
+        for event in decoder.feed(body_bytes[offset:offset + CHUNK_SIZE]):
+            builder.add(event)
+    for event in decoder.close():
+        builder.add(event)
+    return builder.result()
+
+def measure(func, arg):
+    """Return (best seconds over REPEATS, peak traced bytes, result)"""
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = func(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+def run_case(name, body_text):
+    body_bytes = body_text.encode('utf-8')
+    legacy_time, legacy_peak, legacy_result = measure(legacy_parse_sse_response, body_text)
+    parse_time, parse_peak, parse_result = measure(parse_sse_response, body_text)
+    stream_time, stream_peak, stream_result = measure(decode_streamed, body_bytes)
+
+    same = legacy_result == parse_result == stream_result
+    print(f"\n{name}: {len(body_bytes):,} bytes")
+    print(f"  legacy parse_sse_response : {legacy_time * 1000:8.2f} ms  peak {legacy_peak / 1024:9.1f} KiB")
+    print(f"  parse_sse_response        : {parse_time * 1000:8.2f} ms  peak {parse_peak / 1024:9.1f} KiB")
+    print(f"  SSEDecoder ({CHUNK_SIZE} B chunks) : {stream_time * 1000:8.2f} ms  peak {stream_peak / 1024:9.1f} KiB")
+    print(f"  Results identical: {'✅' if same else '❌'}")
+    return same
+
+def main():
+    print("="*70)
+    print("⏱️  SSE parser micro-benchmark")
+    print("="*70)
+
+    all_same = True
+    for token_count in [1_000, 10_000, 100_000]:
+        all_same &= run_case(f"Synthetic stream ({token_count:,} tokens)", make_stream(token_count))
+    all_same &= run_case("Synthetic stream without sources (URL fallback)",
+                         make_stream(10_000, with_sources=False))
+
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            all_same &= run_case(f"Recorded stream {path}", f.read())
+
+    print("\n" + "="*70)
+    print("✅ All parsers agree" if all_same else "❌ Parsers disagree - check the output above")
+    print("="*70)
+    return 0 if all_same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Local stand-in for the Power Automate upload flow: receives, verifies and unpacks uploads
+Usage:
+    python bundle_receiver.py                                 # listen on http://127.0.0.1:8787/
+    SHAREPOINT_UPLOAD_URL=http://127.0.0.1:8787/ KATA_SHAREPOINT_BUNDLE=1 python integrated_test_comparison.py
+    python bundle_receiver.py --verify kata_upload_bundle.zip  # check a bundle without uploading it
+
+Accepts the same JSON bodies as the flow: one request with fileContent, or an upload session of parts
+with chunkContent (SHAREPOINT_UPLOAD_MODE = 'chunked'). Each received file is checked against its
+fileSize and fileSha256; bundles are also checked against their manifest and unpacked next to it.
+The response carries fileUrl and fileSize, like the flow, so the sender verifies the stored size too.
+"""
+import os
+import sys
+import json
+import base64
+import argparse
+import zipfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from integrated_test_comparison import verify_upload_bundle, file_sha256
+
+DEFAULT_PORT = 8787
+DEFAULT_OUTPUT_DIR = "received_uploads"
+
+def safe_filename(name):
+    """Keep only the base name of an uploaded file, so it cannot be written outside the output directory"""
+    return os.path.basename(str(name).replace('\\', '/')) or "upload.bin"
+
+def finish_upload(output_dir, filename, part_file, payload):
+    """Verify a completely received file, move it in place and unpack bundles; returns (status, response)"""
+    size = os.path.getsize(part_file)
+    if payload.get('fileSize') is not None and size != int(payload['fileSize']):
+        os.remove(part_file)
+        return 422, {'error': f"Received {size:,} of {int(payload['fileSize']):,} bytes"}
+    if payload.get('fileSha256') and file_sha256(part_file) != payload['fileSha256']:
+        os.remove(part_file)
+        return 422, {'error': "SHA-256 mismatch"}
+
+    path = os.path.join(output_dir, filename)
+    os.replace(part_file, path)
+    response = {'fileUrl': f"/{os.path.basename(output_dir)}/{filename}", 'fileSize': size, 'verified': True}
+    print(f"  ✅ {filename}: {size:,} bytes, size and SHA-256 verified")
+
+    if zipfile.is_zipfile(path) and not filename.lower().endswith('.xlsx'):
+        manifest, problems = verify_upload_bundle(path)
+        if problems:
+            for problem in problems:
+                print(f"  ❌ {problem}")
+            return 422, {'error': "Bundle does not match its manifest", 'problems': problems}
+
+        unpack_dir = os.path.join(output_dir, os.path.splitext(filename)[0])
+        with zipfile.ZipFile(path) as bundle:
+            for entry in manifest['files']:
+                target = os.path.join(unpack_dir, safe_filename(entry['name']))
+                os.makedirs(unpack_dir, exist_ok=True)
+                with bundle.open(entry['name']) as source, open(target, 'wb') as f:
+                    for block in iter(lambda: source.read(1024 * 1024), b''):
+                        f.write(block)
+                print(f"     📄 {entry['name']}: {entry['size']:,} bytes")
+        response['files'] = [entry['name'] for entry in manifest['files']]
+        print(f"  📦 Bundle verified against its manifest and unpacked to {unpack_dir}")
+
+    return 200, response
+
+def make_handler(output_dir):
+    class UploadHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length))
+            except ValueError as e:
+                self.reply(400, {'error': f"Invalid JSON: {e}"})
+                return
+
+            filename = safe_filename(payload.get('filename'))
+
+            # Single request: the whole file is in fileContent
+            if 'fileContent' in payload:
+                part_file = os.path.join(output_dir, f".{filename}.part")
+                with open(part_file, 'wb') as f:
+                    f.write(base64.b64decode(payload['fileContent']))
+                self.reply(*finish_upload(output_dir, filename, part_file, payload))
+                return
+
+            # Upload session: parts arrive in order and are appended
+            if 'chunkContent' in payload:
+                upload_id = safe_filename(payload.get('uploadId'))
+                part_file = os.path.join(output_dir, f".{upload_id}.part")
+                received = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+                offset = int(payload.get('offset', 0))
+                if offset > received:
+                    self.reply(409, {'error': f"Part at offset {offset:,} but only {received:,} bytes received"})
+                    return
+
+                # A retried part overwrites what it sent before
+                with open(part_file, 'r+b' if received else 'wb') as f:
+                    f.seek(offset)
+                    f.write(base64.b64decode(payload['chunkContent']))
+                    f.truncate()
+
+                chunk_index = int(payload.get('chunkIndex', 0))
+                chunk_count = int(payload.get('chunkCount', 1))
+                print(f"  📥 {filename}: part {chunk_index + 1}/{chunk_count}")
+                if chunk_index + 1 < chunk_count:
+                    self.reply(200, {'received': os.path.getsize(part_file)})
+                else:
+                    self.reply(*finish_upload(output_dir, filename, part_file, payload))
+                return
+
+            self.reply(400, {'error': "Expected fileContent or chunkContent"})
+
+    return UploadHandler
+
+def verify_bundle_file(path):
+    """Check a bundle on disk against its manifest and print the result"""
+    manifest, problems = verify_upload_bundle(path)
+    if manifest is not None:
+        for entry in manifest['files']:
+            print(f"  📄 {entry['name']}: {entry['size']:,} bytes, sha256 {entry['sha256'][:16]}...")
+    for problem in problems:
+        print(f"  ❌ {problem}")
+    print("✅ Bundle matches its manifest" if not problems else "❌ Bundle is damaged")
+    return 0 if not problems else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Power Automate upload flow")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help="Directory received files are written to")
+    parser.add_argument('--verify', metavar='BUNDLE', help="Only verify a bundle file against its manifest")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        return verify_bundle_file(args.verify)
+
+    os.makedirs(args.output, exist_ok=True)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(args.output))
+    print("="*70)
+    print(f"📬 Upload receiver listening on http://127.0.0.1:{args.port}/ (files go to {args.output}/)")
+    print("="*70)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Receiver stopped")
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
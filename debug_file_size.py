@@ -2,7 +2,11 @@
 Debug: Check file sizes and compare
 """
 import os
+import json
 import base64
+import hashlib
+
+from integrated_test_comparison import Base64JsonBody, file_sha256
 
 # Check the local test file
 local_file = 'TEST_Degraded_Responses_Report.xlsx'
@@ -30,6 +34,15 @@ if os.path.exists(local_file):
         print('✅ Base64 encoding/decoding works correctly locally')
     else:
         print('❌ Base64 encoding/decoding is broken!')
+    
+    # Check the streamed upload body the script actually sends
+    body = Base64JsonBody(local_file, {'fileSize': file_size, 'fileSha256': file_sha256(local_file)})
+    payload = b''.join(iter(lambda: body.read(8192), b''))
+    print(f'\nStreamed JSON body: {len(payload):,} bytes (Content-Length {len(body):,})')
+    streamed = base64.b64decode(json.loads(payload)['fileContent'])
+    streamed_ok = len(payload) == len(body) and hashlib.sha256(streamed).hexdigest() == file_sha256(local_file)
+    print(f'Streamed body decodes to original: {streamed_ok}')
+    print('✅ Streamed upload body is intact' if streamed_ok else '❌ Streamed upload body is broken!')
 else:
     print(f'❌ File not found: {local_file}')
 
@@ -40,3 +53,4 @@ print('Go to SharePoint and check the file size of:')
 print('2025-11-25_18-43-29_TEST_Degraded_Responses_Report.xlsx')
 print('\nCompare it with the local file size above.')
 print('If SharePoint file is much smaller, the upload is truncating data.')
+print('Uploads send fileSize and fileSha256 with the content; have the flow return fileSize to verify it.')
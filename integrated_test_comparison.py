@@ -5,6 +5,27 @@ Integrated Testing & Comparison System
 - Identifies objectively worse responses
 - Saves degraded responses to separate Excel
 - Sends Microsoft Teams alerts for issues
+- Runs prompts concurrently with a bounded worker pool per agent
+- Runs all mentor sheets in parallel, bounded by the slowest agent
+- Optional asyncio client that streams SSE events as they arrive (httpx)
+- Pooled keep-alive HTTP connections shared by every call in the run
+- Incremental SSE decoder shared by the sync and async clients
+- Optional on-disk response cache so unchanged backends are not re-asked
+- Checkpoint journal so an interrupted run can be resumed with --resume
+- Compiled benchmark index cache, rebuilt only when compare.xlsx changes
+- Optional TF-IDF similarity against GOOD benchmarks (numpy), vectors cached next to compare.xlsx
+- Optional streaming output writer (openpyxl write-only) with flat memory use
+- SQLite results store with one row per (run, sheet, serial) for trend queries
+- Adaptive per-agent rate limiter with jittered retries that honor Retry-After
+- Per-agent circuit breaker that reports a dead endpoint once instead of per prompt
+- Per-request DNS/connect/TLS/TTFB/total timing and body size, with p50/p90/p99 per agent
+- Latency degradation checks against the benchmark latency column or stored run history
+- Opt-in profiling (--profile): per-stage timers plus optional cProfile/pyinstrument dumps
+- Streamed SharePoint upload (base64 encoded on the fly, optional chunked sessions) with size and SHA-256
+- Optional upload bundle: one zip of the run's workbooks with a manifest of sizes and hashes
+- Background notification queue: sheet/HIGH/run events posted to Teams and SharePoint with retries
+- Early-warning Teams cards when an agent's HIGH findings cross a count or rate threshold (debounced)
+- Teams alerts deduplicated across runs: only new or changed findings are listed, the rest go into a digest
 """
 import openpyxl
 import requests
@@ -13,13 +34,75 @@ import urllib.parse
 import os
 import re
 import json
-from datetime import datetime
+import time
+import random
+import asyncio
+import threading
+import queue
+import socket
+import sqlite3
+import hashlib
+import argparse
+import base64
+import pickle
+import statistics
+import contextlib
+import cProfile
+import pstats
+from copy import copy
+import zlib
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx  # Only needed for the asyncio client (ENABLE_ASYNC_CLIENT)
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  Enables HTTP/2 in the asyncio client when installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import numpy as np  # Only needed for the TF-IDF similarity engine (SIMILARITY_ENGINE = 'tfidf')
+except ImportError:
+    np = None
+
+try:
+    import pyinstrument  # Only needed for --profile pyinstrument
+except ImportError:
+    pyinstrument = None
 
 # ===== CONFIG =====
 BENCHMARK_FILE = "compare.xlsx"  # Benchmark file with good/neutral/bad markings
 NEW_OUTPUT_FILE = "Direct Query Master List V_Test.xlsx"  # New test results
 DEGRADED_OUTPUT_FILE = "Degraded_Responses_Report.xlsx"  # Bad responses
+# 'in-place' - load the results workbook, fill it in and save it (keeps dashboards, charts and formatting)
+# 'streaming' - re-emit every sheet through a write-only workbook as results complete (cell values only)
+OUTPUT_WRITE_MODE = os.environ.get('KATA_OUTPUT_MODE', 'in-place')
+BENCHMARK_INDEX_CACHE_FILE = "compare.xlsx.index.pkl"  # Compiled benchmark, keyed by compare.xlsx hash
+BENCHMARK_INDEX_FORMAT = 2  # Bump when parse_benchmark_rows changes what an entry holds (2: 'latency')
+ENABLE_BENCHMARK_INDEX_CACHE = True  # Set to False to always re-parse compare.xlsx
+
+# Similarity Configuration (GOOD benchmark vs new response)
+# 'overlap' - word-set overlap; 'tfidf' - hashed n-gram TF-IDF cosine (needs numpy)
+SIMILARITY_ENGINE = os.environ.get('KATA_SIMILARITY_ENGINE', 'overlap')
+SIMILARITY_THRESHOLD = 0.25  # TF-IDF cosine below this is a significant difference
+SIMILARITY_DIMENSIONS = 2 ** 13  # Hash buckets for word unigrams and bigrams
+BENCHMARK_VECTORS_FILE = "compare.xlsx.vectors.npz"  # Benchmark TF-IDF vectors, keyed by compare.xlsx hash
+BENCHMARK_VECTORS_FORMAT = 1  # Bump when the tokenizer or the vector layout changes
 
 # Test mode: process only first 10 rows
 TEST_LIMIT = None  # Set to None for full processing
@@ -36,12 +119,86 @@ HEADERS = {
 
 SESSION_ID = "43908e3d-7fee-4688-a6c5-f3bd32a94ffd"
 
+# Concurrent execution: prompts of a sheet are sent in parallel, bounded per agent
+ENABLE_CONCURRENT_EXECUTION = True  # Set to False to send one prompt at a time
+DEFAULT_MAX_WORKERS = 4  # Used when a sheet config has no 'max_workers'
+ENABLE_PARALLEL_SHEETS = True  # Run all sheets (agents) at the same time
+
+# Asyncio client: streams SSE events on one shared event loop (requires httpx)
+ENABLE_ASYNC_CLIENT = False  # Set to True to use the asyncio client instead of worker threads
+ASYNC_MAX_IN_FLIGHT = 32  # Max concurrent streaming requests per agent
+
+# Rate limiting: token bucket per agent whose rate adapts to the backend (AIMD)
+ENABLE_RATE_LIMIT = True
+RATE_LIMIT_PER_SECOND = 8.0  # Starting rate per agent; override with 'rate_limit' in SHEET_CONFIGS
+RATE_LIMIT_MIN_PER_SECOND = 0.5  # Rate never drops below this when the backend pushes back
+RATE_LIMIT_MAX_PER_SECOND = 32.0  # Rate never grows above this on sustained success
+RATE_LIMIT_INCREASE = 0.25  # Requests/second added per successful call
+RATE_LIMIT_BURST = 4  # Requests that may go out back to back
+
+# Retries: throttled, failed and timed out calls are retried with jittered exponential backoff
+MAX_RETRIES = 3  # Set to 0 to report the first failure
+RETRY_BASE_DELAY = 1.0  # Seconds; backoff window doubles each attempt
+RETRY_MAX_DELAY = 30.0  # Upper bound of the backoff window
+RETRY_AFTER_MAX = 120.0  # Longest Retry-After we are willing to honor
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Circuit breaker: stop calling an agent that keeps failing, probe now and then to recover
+ENABLE_CIRCUIT_BREAKER = True
+CIRCUIT_BREAKER_THRESHOLD = 5  # Consecutive prompts failing after all retries that open the circuit
+CIRCUIT_BREAKER_PROBE_INTERVAL = 30.0  # Seconds an open circuit waits (callers queue) before letting one probe through
+
+# Latency metrics: per-request timing phases and response size, summarized per agent
+ENABLE_LATENCY_METRICS = True
+LATENCY_SHEET_NAME = "Latency Metrics"  # Sheet (re)written at the end of the results workbook
+
+# Latency degradation: flag answers (and agents) that got much slower than their baseline.
+# A prompt's baseline is its stored latencies from recent runs (results store), or the benchmark's
+# latency column while fewer than LATENCY_MIN_SAMPLES runs are stored
+ENABLE_LATENCY_DEGRADATION = True
+LATENCY_COLUMN_HEADER = "Latency (s)"  # Column holding each answer's latency in the results workbook and benchmark
+LATENCY_BASELINE_RUNS = 10  # Most recent stored runs that make up the baseline
+LATENCY_MIN_SAMPLES = 3  # Stored latencies needed before z-scores and agent p90s are used
+LATENCY_Z_THRESHOLD = 3.0  # Flag a prompt this many standard deviations above its baseline mean...
+LATENCY_SLOWDOWN_RATIO = 2.0  # ...and at least this many times slower than its baseline median...
+LATENCY_MIN_SLOWDOWN = 2.0  # ...and at least this many seconds slower (ignores jitter on fast prompts)
+LATENCY_P90_SLOWDOWN_RATIO = 1.5  # Flag an agent whose p90 latency grew by this factor over its baseline p90
+LATENCY_SEVERITY = "MEDIUM"  # Severity of latency findings
+LATENCY_HIGH_SLOWDOWN_RATIO = 5.0  # Findings at least this many times slower than baseline are HIGH
+
+# Connection pooling: one keep-alive pool per run, reused by all sheets, uploads and alerts
+HTTP_POOL_SIZE = 32  # Max pooled connections per host
+ENABLE_HTTP2 = True  # Async client uses HTTP/2 when the 'h2' package is installed
+
+# Response cache (SQLite), keyed by agent, normalized prompt and backend version
+#   'off'                  - no cache
+#   'refresh'              - always call the API, store successful answers
+#   'changed-backend-only' - call the API only for prompts not cached for BACKEND_VERSION
+RESPONSE_CACHE_MODE = os.environ.get('KATA_CACHE_MODE', 'off')
+RESPONSE_CACHE_FILE = "kata_response_cache.sqlite"
+RESPONSE_CACHE_TTL_HOURS = 24  # Cached answers older than this are misses
+RESPONSE_CACHE_MAX_ENTRIES = 5000  # Least recently used entries beyond this are evicted
+BACKEND_VERSION = os.environ.get('KATA_BACKEND_VERSION', '')  # e.g. deployed image tag/build id
+
+# Results store (SQLite): one row per (run, sheet, serial) for trend queries across runs
+ENABLE_RESULTS_STORE = True
+RESULTS_STORE_FILE = "kata_results.sqlite"
+
+# Profiling (--profile): stage-level breakdown written at the end of a profiled run
+PROFILE_REPORT_FILE = "kata_profile.json"
+PROFILE_DUMP_FILE = "kata_profile"  # --profile cprofile writes .prof, --profile pyinstrument writes .html
+PROFILE_TOP_FUNCTIONS = 25  # Functions listed from the cProfile dump
+
+# Checkpoint journal: every completed prompt is appended here; --resume skips those already done
+CHECKPOINT_FILE = "kata_checkpoint.jsonl"
+CHECKPOINT_MAX_AGE_HOURS = 24  # Journaled results older than this are asked again on resume
+
 # Sheet configurations
 SHEET_CONFIGS = {
-    3: {'name': 'PSP Mentor', 'api_path': '/api/pspmentor', 'agent_id': 'psp'},
-    4: {'name': 'VSM Mentor', 'api_path': '/api/vsmmentor', 'agent_id': 'vsm'},
-    5: {'name': 'TPI Mentor', 'api_path': '/api/tpimentor', 'agent_id': 'tpi'},
-    6: {'name': 'Search/Chat', 'api_path': '/api/chat', 'agent_id': 'search'}
+    3: {'name': 'PSP Mentor', 'api_path': '/api/pspmentor', 'agent_id': 'psp', 'max_workers': 4},
+    4: {'name': 'VSM Mentor', 'api_path': '/api/vsmmentor', 'agent_id': 'vsm', 'max_workers': 4},
+    5: {'name': 'TPI Mentor', 'api_path': '/api/tpimentor', 'agent_id': 'tpi', 'max_workers': 4},
+    6: {'name': 'Search/Chat', 'api_path': '/api/chat', 'agent_id': 'search', 'max_workers': 4}
 }
 
 # Microsoft Teams Webhook URL - "Kata Bugs Webhook Channel"
@@ -54,9 +211,579 @@ SHAREPOINT_UPLOAD_URL = os.environ.get('SHAREPOINT_UPLOAD_URL', 'https://default
 ENABLE_TEAMS_ALERTS = True  # Now enabled with working Office 365 Incoming Webhook!
 ENABLE_SHAREPOINT_UPLOAD = True  # Upload degraded responses report to SharePoint
 
+# SharePoint upload: the report is base64-encoded while it is sent, never held in memory as a whole
+#   'single'  - one streamed JSON request with fileContent (works with the existing flow)
+#   'chunked' - an upload session of SHAREPOINT_CHUNK_SIZE parts with chunkContent, appended in order by the flow
+SHAREPOINT_UPLOAD_MODE = os.environ.get('KATA_SHAREPOINT_UPLOAD_MODE', 'single')
+SHAREPOINT_CHUNK_SIZE = 3 * 1024 * 1024  # Report bytes per part in 'chunked' mode (a multiple of 3)
+SHAREPOINT_UPLOAD_TIMEOUT = 120  # Seconds an upload request may stall before it gives up
+
+# Upload bundle: one zip of the run's artifacts plus a manifest of their sizes and SHA-256 (one webhook call)
+SHAREPOINT_UPLOAD_BUNDLE = os.environ.get('KATA_SHAREPOINT_BUNDLE', '0') == '1'
+UPLOAD_BUNDLE_FILE = "kata_upload_bundle.zip"
+UPLOAD_BUNDLE_MANIFEST = "manifest.json"
+UPLOAD_BUNDLE_COMPRESSLEVEL = 9
+
+# Notifications: run events (sheet finished, HIGH finding, run finished) are handled by background workers,
+# so Teams posts and the SharePoint upload run next to the remaining sheets instead of after them
+ENABLE_NOTIFICATION_QUEUE = True  # False handles every event inline, in the thread that publishes it
+NOTIFY_WORKERS = 2  # Events handled at the same time (a slow upload does not hold up a Teams card)
+NOTIFY_SHEET_CARDS = True  # Post a compact Teams card as soon as a sheet finishes with HIGH findings (without early warning)
+NOTIFY_SHEET_CARD_ISSUES = 3  # HIGH findings listed on a sheet or early-warning card
+
+# Early warning: results are scored on the notification workers as they arrive, and a compact Teams card is
+# posted as soon as one agent has EARLY_WARNING_HIGH_COUNT new HIGH findings or a HIGH rate of EARLY_WARNING_HIGH_RATE
+ENABLE_EARLY_WARNING = True
+EARLY_WARNING_HIGH_COUNT = 5  # New HIGH findings of one agent that trigger a card
+EARLY_WARNING_HIGH_RATE = 0.3  # Share of an agent's scored results that are HIGH (0 disables the rate trigger)
+EARLY_WARNING_MIN_RESULTS = 10  # Scored results an agent needs before the rate trigger applies
+EARLY_WARNING_DEBOUNCE = 900  # Seconds between two cards for one agent; findings in between go on the next card
+
+# Alert deduplication: findings are fingerprinted by (agent, serial, reason class) and remembered across runs,
+# so Teams only hears about new or changed findings; ongoing ones are batched into a digest
+ENABLE_ALERT_DEDUP = True
+ALERT_STATE_FILE = "kata_alert_state.json"
+ALERT_MAX_ISSUES = 10  # New or changed findings listed one by one; the rest go into the digest
+ALERT_DIGEST_DAYS = 7  # Post a digest of ongoing findings at least this often, even when nothing is new
+
+# ===== PROFILING =====
+class StageProfiler:
+    """
+    Wall-clock timers per pipeline stage (benchmark load, API call, parse, compare, ...), shared by all threads.
+    Stages running in parallel threads each count their own time, so their totals can exceed the run time.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+    
+    def add(self, name, seconds):
+        with self._lock:
+            calls, total, longest = self.stages.get(name, (0, 0.0, 0.0))
+            self.stages[name] = (calls + 1, total + seconds, max(longest, seconds))
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+    
+    def report(self):
+        """Run wall time and [stage dict] sorted by total time; share is the total over the run's wall time"""
+        wall = time.perf_counter() - self.started
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1][1], reverse=True)
+        return wall, [
+            {'stage': name, 'calls': calls, 'total': total, 'mean': total / calls, 'max': longest,
+             'share': total / wall if wall else 0.0}
+            for name, (calls, total, longest) in stages
+        ]
+    
+    def print_report(self):
+        wall, stages = self.report()
+        print(f"\n{'='*70}")
+        print(f"🔬 Stage breakdown (run wall time {wall:.2f}s, parallel stages can add up to more)")
+        print(f"{'='*70}")
+        print(f"  {'Stage':<20}{'Calls':>7}{'Total':>10}{'Mean':>10}{'Max':>10}{'Share':>8}")
+        for row in stages:
+            print(f"  {row['stage']:<20}{row['calls']:>7}{row['total']:>9.2f}s{row['mean']:>9.3f}s"
+                  f"{row['max']:>9.3f}s{row['share']:>7.0%}")
+    
+    def save(self, path=PROFILE_REPORT_FILE):
+        wall, stages = self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'wall_time': wall, 'stages': stages}, f, indent=2)
+
+_profiler = None
+
+def profile_stage(name):
+    """Time a block as pipeline stage name when profiling (--profile), otherwise do nothing"""
+    return _profiler.stage(name) if _profiler is not None else contextlib.nullcontext()
+
+def profile_add(name, seconds):
+    """Add time measured elsewhere to pipeline stage name when profiling"""
+    if _profiler is not None:
+        _profiler.add(name, seconds)
+
+# ===== LATENCY METRICS =====
+# Timing of the request in flight on the current thread, filled in by the timed connections
+_request_timing = threading.local()
+_latency_samples = {}
+_latency_lock = threading.Lock()
+
+def new_request_timing():
+    """
+    Empty timing record of one HTTP request, in seconds (bytes = decoded body size).
+    dns/connect/tls stay None when a pooled connection was reused.
+    """
+    return {'dns': None, 'connect': None, 'tls': None, 'ttfb': None, 'ttft': None, 'total': None, 'bytes': 0}
+
+@contextlib.contextmanager
+def request_timing():
+    """Time the request made inside the block on this thread; yields its timing record"""
+    timing = new_request_timing()
+    _request_timing.current = timing
+    started = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing['total'] = time.perf_counter() - started
+        _request_timing.current = None
+
+def current_request_timing():
+    """Timing record of the request in flight on this thread, or None"""
+    return getattr(_request_timing, 'current', None)
+
+class _TimedConnectionMixin:
+    """Records DNS, TCP connect and TLS handshake times of new connections in the current request timing"""
+    
+    def _new_conn(self):
+        timing = current_request_timing()
+        if timing is None:
+            return super()._new_conn()
+        
+        host = self._dns_host
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            # Let urllib3 resolve again and raise its usual NameResolutionError
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        
+        # Connect to the address just resolved so the lookup isn't timed twice
+        self._dns_host = addresses[0][4][0]
+        try:
+            sock = super()._new_conn()
+        except Exception:
+            if len(addresses) == 1:
+                raise
+            # First address unreachable: let urllib3 try every address as usual
+            self._dns_host = host
+            sock = super()._new_conn()
+        finally:
+            self._dns_host = host
+        
+        timing['dns'] = resolved - started
+        timing['connect'] = time.perf_counter() - resolved
+        return sock
+    
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        timing = current_request_timing()
+        if timing is not None and timing['connect'] is not None and isinstance(self, HTTPSConnection):
+            timing['tls'] = max(0.0, time.perf_counter() - started - timing['dns'] - timing['connect'])
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools time DNS, connect and TLS of every new connection"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+def httpx_trace(timing, started):
+    """
+    httpx 'trace' extension filling a timing record from httpcore connection events.
+    httpcore resolves the host inside connect_tcp, so DNS is counted in 'connect' and 'dns' stays None.
+    """
+    marks = {}
+    
+    async def trace(event_name, info):
+        now = time.perf_counter()
+        if event_name.endswith('.started'):
+            marks[event_name[:-len('.started')]] = now
+        elif event_name == 'connection.connect_tcp.complete':
+            timing['connect'] = now - marks.get('connection.connect_tcp', now)
+        elif event_name == 'connection.start_tls.complete':
+            timing['tls'] = now - marks.get('connection.start_tls', now)
+        elif event_name.endswith('.receive_response_headers.complete'):
+            timing['ttfb'] = now - started
+    
+    return trace
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list, None when empty"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def record_latency(agent_id, timing):
+    """Add one request's timing record to the agent's samples"""
+    if not ENABLE_LATENCY_METRICS or not timing:
+        return
+    with _latency_lock:
+        _latency_samples.setdefault(agent_id, []).append(timing)
+
+def latency_summary():
+    """
+    {agent_id: metrics} over every request timed so far: call count, p50/p90/p99 of total time and TTFB,
+    mean DNS/connect/TLS of the calls that opened a new connection, and response sizes.
+    Agents are listed in SHEET_CONFIGS order.
+    """
+    with _latency_lock:
+        samples = {agent_id: list(timings) for agent_id, timings in _latency_samples.items()}
+    
+    def mean(values):
+        return sum(values) / len(values) if values else None
+    
+    summary = {}
+    agent_order = [config['agent_id'] for config in SHEET_CONFIGS.values()]
+    for agent_id in sorted(samples, key=lambda a: agent_order.index(a) if a in agent_order else len(agent_order)):
+        timings = samples[agent_id]
+        totals = sorted(t['total'] for t in timings if t.get('total') is not None)
+        ttfbs = sorted(t['ttfb'] for t in timings if t.get('ttfb') is not None)
+        sizes = sorted(t.get('bytes') or 0 for t in timings)
+        summary[agent_id] = {
+            'calls': len(timings),
+            'new_connections': sum(1 for t in timings if t.get('connect') is not None),
+            'dns_mean': mean([t['dns'] for t in timings if t.get('dns') is not None]),
+            'connect_mean': mean([t['connect'] for t in timings if t.get('connect') is not None]),
+            'tls_mean': mean([t['tls'] for t in timings if t.get('tls') is not None]),
+            **{f"total_p{pct}": percentile(totals, pct) for pct in (50, 90, 99)},
+            **{f"ttfb_p{pct}": percentile(ttfbs, pct) for pct in (50, 90, 99)},
+            'bytes_p50': percentile(sizes, 50),
+            'bytes_total': sum(sizes)
+        }
+    return summary
+
+def reset_latency_metrics():
+    """Forget all timing samples (e.g. between runs in the same process)"""
+    with _latency_lock:
+        _latency_samples.clear()
+
+def format_timing(timing):
+    """One-line summary of a timing record for progress output"""
+    parts = [f"total: {timing['total'] or 0:.2f}s", f"TTFB: {timing['ttfb'] or 0:.2f}s"]
+    if timing.get('ttft') is not None:
+        parts.append(f"TTFT: {timing['ttft']:.2f}s")
+    if timing.get('connect') is not None:
+        parts.append(f"connect: {timing['connect']:.3f}s")
+    if timing.get('tls') is not None:
+        parts.append(f"TLS: {timing['tls']:.3f}s")
+    parts.append(f"{(timing.get('bytes') or 0) / 1024:.1f} KB")
+    return ", ".join(parts)
+
+# ===== HTTP CONNECTION POOL =====
+_http_session = None
+_async_runner = None
+_http_lock = threading.Lock()
+
+def create_http_session(pool_size=HTTP_POOL_SIZE):
+    """
+    Create a requests.Session with a keep-alive connection pool of pool_size per host.
+    With ENABLE_LATENCY_METRICS its connections time DNS, connect and TLS (TimedHTTPAdapter).
+    """
+    session = requests.Session()
+    adapter_class = TimedHTTPAdapter if ENABLE_LATENCY_METRICS else HTTPAdapter
+    adapter = adapter_class(pool_connections=10, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_http_session():
+    """Return the run's pooled requests.Session, creating it on first use"""
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        return _http_session
+
+class AsyncClientRunner:
+    """
+    Background event loop owning one pooled httpx.AsyncClient.
+    Sheet threads submit coroutines to it, so every agent shares the same loop and connections.
+    """
+    
+    def __init__(self, pool_size=HTTP_POOL_SIZE):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="kata-async-loop", daemon=True)
+        self.thread.start()
+        self.client = self.run(self._create_client(pool_size))
+    
+    async def _create_client(self, pool_size):
+        return httpx.AsyncClient(
+            verify=False,
+            http2=ENABLE_HTTP2 and HTTP2_AVAILABLE,
+            # Waiting for a pooled connection is bounded by the per-agent semaphores instead
+            timeout=httpx.Timeout(60, pool=None),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+    
+    def run(self, coro):
+        """Run a coroutine on the shared loop and block until it finishes"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+    
+    def close(self):
+        self.run(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+def get_async_runner():
+    """Return the run's shared AsyncClientRunner, creating it on first use"""
+    global _async_runner
+    with _http_lock:
+        if _async_runner is None:
+            _async_runner = AsyncClientRunner()
+        return _async_runner
+
+def close_http_clients():
+    """Close the pooled session and async client at the end of the run"""
+    global _http_session, _async_runner
+    with _http_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+        if _async_runner is not None:
+            _async_runner.close()
+            _async_runner = None
+
+# ===== RATE LIMITING / RETRIES =====
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every request of one agent, in worker threads and on the event loop.
+    The rate grows by RATE_LIMIT_INCREASE per success and halves (at most once per second)
+    when the backend pushes back, staying between RATE_LIMIT_MIN/MAX_PER_SECOND.
+    A Retry-After from the backend pauses the whole agent until it has passed.
+    """
+    
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST,
+                 min_rate=RATE_LIMIT_MIN_PER_SECOND, max_rate=RATE_LIMIT_MAX_PER_SECOND):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+    
+    def reserve(self):
+        """Take a token and return how many seconds the caller must wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate, self.paused_until - now)
+    
+    def acquire(self):
+        """Block the calling thread until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        """Suspend the calling coroutine until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RATE_LIMIT_INCREASE)
+    
+    def on_throttle(self, retry_after=None):
+        """Back off after a throttled/failed call, pausing for Retry-After when given"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_decrease >= 1.0:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.last_decrease = now
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + min(retry_after, RETRY_AFTER_MAX))
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(agent_id):
+    """Return the agent's shared AdaptiveRateLimiter, or None when ENABLE_RATE_LIMIT is off"""
+    if not ENABLE_RATE_LIMIT:
+        return None
+    with _rate_limiters_lock:
+        if agent_id not in _rate_limiters:
+            rate = next((config.get('rate_limit', RATE_LIMIT_PER_SECOND) for config in SHEET_CONFIGS.values()
+                         if config['agent_id'] == agent_id), RATE_LIMIT_PER_SECOND)
+            _rate_limiters[agent_id] = AdaptiveRateLimiter(rate=rate)
+        return _rate_limiters[agent_id]
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def http_error_result(status_code, retry_after_header=None):
+    """Error result for a non-200 response, marked retryable for throttling/server errors"""
+    return {
+        'status': 'error',
+        'response': f"HTTP {status_code}",
+        'sources': [],
+        'http_status': status_code,
+        'retry_after': parse_retry_after(retry_after_header),
+        'retryable': status_code in RETRYABLE_STATUS_CODES
+    }
+
+def retry_delay(attempt, retry_after=None):
+    """Seconds before retry number attempt + 1: Retry-After if given, else full-jitter backoff"""
+    if retry_after is not None:
+        return min(retry_after, RETRY_AFTER_MAX)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+class CircuitBreaker:
+    """
+    Per-agent circuit breaker. A prompt that still fails after its retries counts as one failure;
+    after `threshold` consecutive failed prompts the circuit opens. Callers then wait until
+    probe_interval seconds have passed and a single probe call is let through (half-open), while the
+    others wait for its outcome. Success closes the circuit and everyone carries on. A failed probe
+    means the agent is down: calls are short-circuited without touching the network, and one probe
+    is let through every probe_interval.
+    """
+    
+    def __init__(self, agent_id, threshold=CIRCUIT_BREAKER_THRESHOLD, probe_interval=CIRCUIT_BREAKER_PROBE_INTERVAL):
+        self.agent_id = agent_id
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.down = False  # True once a probe failed
+        self._condition = threading.Condition()
+    
+    def _check(self):
+        """(True/False, 0) once the caller may call or must short-circuit, (None, seconds) while it must wait"""
+        if self.state == 'closed':
+            return True, 0
+        if self.state == 'open':
+            wait = self.opened_at + self.probe_interval - time.monotonic()
+            if wait <= 0:
+                self.state = 'half-open'
+                print(f"  🔌 [{self.agent_id}] Circuit half-open - sending a probe call")
+                return True, 0
+            if self.down:
+                return False, 0
+            return None, wait
+        # Half-open: a probe is in flight
+        return None, self.probe_interval
+    
+    def allow(self):
+        """Return True if a call may be made now, False to short-circuit it; may wait for a probe"""
+        with self._condition:
+            while True:
+                allowed, wait = self._check()
+                if allowed is not None:
+                    return allowed
+                self._condition.wait(wait)
+    
+    async def allow_async(self):
+        """allow() for coroutines: waits without blocking the event loop"""
+        while True:
+            with self._condition:
+                allowed, wait = self._check()
+            if allowed is not None:
+                return allowed
+            await asyncio.sleep(min(wait, 0.5))
+    
+    def record_success(self):
+        with self._condition:
+            if self.state != 'closed':
+                print(f"  🔌 [{self.agent_id}] Probe succeeded - circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.down = False
+            self._condition.notify_all()
+    
+    def record_failure(self, final=True):
+        """Record a failed call; final is False when the prompt will still be retried"""
+        with self._condition:
+            if self.state == 'half-open':
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.down = True
+                print(f"  🔌 [{self.agent_id}] Probe failed - skipping calls for {self.probe_interval:.0f}s")
+                self._condition.notify_all()
+                return
+            if not final:
+                return
+            self.failures += 1
+            if self.state == 'closed' and self.failures >= self.threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                print(f"  🔌 [{self.agent_id}] Circuit open after {self.failures} consecutive failed prompts - "
+                      f"probing in {self.probe_interval:.0f}s")
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(agent_id):
+    """Return the agent's shared CircuitBreaker, or None when ENABLE_CIRCUIT_BREAKER is off"""
+    if not ENABLE_CIRCUIT_BREAKER:
+        return None
+    with _circuit_breakers_lock:
+        if agent_id not in _circuit_breakers:
+            _circuit_breakers[agent_id] = CircuitBreaker(agent_id)
+        return _circuit_breakers[agent_id]
+
+def circuit_open_result():
+    """Result for a call skipped because the agent's circuit is open"""
+    return {'status': 'error', 'response': 'Agent unavailable (circuit breaker open)', 'sources': [],
+            'short_circuited': True}
+
+def should_retry(result, attempt, agent_id, limiter, breaker=None):
+    """
+    Feed a call's outcome to the rate limiter and circuit breaker and decide whether to retry it.
+    On retry, slows the agent down and returns the delay; otherwise returns None.
+    """
+    if result['status'] == 'success':
+        if limiter is not None:
+            limiter.on_success()
+        if breaker is not None:
+            breaker.record_success()
+        return None
+    
+    final = not result.get('retryable') or attempt >= MAX_RETRIES
+    if breaker is not None:
+        breaker.record_failure(final)
+    if final:
+        return None
+    
+    if limiter is not None:
+        limiter.on_throttle(result.get('retry_after'))
+    delay = retry_delay(attempt, result.get('retry_after'))
+    print(f"  🔁 [{agent_id}] {result['response']} - retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+    return delay
+
 # ===== API FUNCTIONS =====
-def send_question_to_api(prompt, api_url, agent_id):
-    """Send a question to the API and return the response"""
+def build_api_payload(prompt, agent_id):
+    """Build the form-encoded request body for a question"""
     conversation_id = str(uuid.uuid4())
     
     payload_dict = {
@@ -70,99 +797,394 @@ def send_question_to_api(prompt, api_url, agent_id):
         "container": "useruploaded"
     }
     
-    payload_encoded = urllib.parse.urlencode(payload_dict)
+    return urllib.parse.urlencode(payload_dict)
+
+def send_question_to_api(prompt, api_url, agent_id):
+    """
+    Send a question to the API and return the response.
+    Waits for the agent's rate limiter and retries throttled/failed calls (see MAX_RETRIES);
+    'attempts' in the result tells how many calls were made.
+    'timing' (see new_request_timing) and 'latency' are those of the last attempt.
+    While the agent's circuit breaker is open no call is made and the result is short-circuited.
+    """
+    limiter = get_rate_limiter(agent_id)
+    breaker = get_circuit_breaker(agent_id)
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            result = circuit_open_result()
+            break
+        if limiter is not None:
+            with profile_stage('rate limit wait'):
+                limiter.acquire()
+        with request_timing() as timing:
+            result = send_question_once(prompt, api_url, agent_id)
+        result['timing'] = timing
+        result['latency'] = timing['total']
+        attempt += 1
+        delay = should_retry(result, attempt - 1, agent_id, limiter, breaker)
+        if delay is None:
+            break
+        with profile_stage('retry backoff'):
+            time.sleep(delay)
+    
+    result['attempts'] = attempt
+    if 'timing' in result:
+        record_latency(agent_id, result['timing'])
+    return result
+
+def send_question_once(prompt, api_url, agent_id):
+    """Make one API call for a question and return the response"""
+    payload_encoded = build_api_payload(prompt, agent_id)
     
     try:
-        response = requests.post(api_url, data=payload_encoded, headers=HEADERS, verify=False, timeout=60)
+        with profile_stage('API call'):
+            response = get_http_session().post(api_url, data=payload_encoded, headers=HEADERS, verify=False, timeout=60)
+        
+        timing = current_request_timing()
+        if timing is not None:
+            # requests stops 'elapsed' once the response headers are parsed
+            timing['ttfb'] = response.elapsed.total_seconds()
+            timing['bytes'] = len(response.content)
         
         if response.status_code == 200:
-            if not response.text.strip():
-                return {'status': 'success', 'response': 'Empty response from API', 'sources': []}
-            
-            response_text = response.text.strip()
-            
-            if response_text.startswith('data:') or '\ndata:' in response_text:
-                return parse_sse_response(response_text)
-            else:
-                return parse_json_response(response_text)
+            with profile_stage('parse'):
+                response_text = response.text.strip()
+                if not response_text:
+                    return {'status': 'success', 'response': 'Empty response from API', 'sources': []}
+                
+                if response_text.startswith('data:') or '\ndata:' in response_text:
+                    return parse_sse_response(response_text)
+                else:
+                    return parse_json_response(response_text)
         else:
-            return {'status': 'error', 'response': f"HTTP {response.status_code}", 'sources': []}
+            return http_error_result(response.status_code, response.headers.get('Retry-After'))
             
     except requests.Timeout:
-        return {'status': 'error', 'response': 'Request timeout (60s)', 'sources': []}
+        return {'status': 'error', 'response': 'Request timeout (60s)', 'sources': [], 'retryable': True}
+    except requests.ConnectionError as e:
+        return {'status': 'error', 'response': f"Error: {str(e)[:100]}", 'sources': [], 'retryable': True}
     except Exception as e:
         return {'status': 'error', 'response': f"Error: {str(e)[:100]}", 'sources': []}
 
-def parse_sse_response(response_text):
-    """Parse SSE format response"""
-    content_parts = []
-    extracted_urls = []
+def run_prompts_concurrently(jobs, api_url, agent_id, max_workers, on_result=None):
+    """
+    Send (row_idx, prompt) jobs to the API with at most max_workers requests in flight.
+    on_result(row_idx, result) is called as each result arrives (e.g. to checkpoint it).
+    Returns {row_idx: result}; callers walk the jobs in order so output stays deterministic.
+    """
+    results = {}
     
-    for line in response_text.split('\n'):
-        line = line.strip()
-        if line.startswith('data: '):
-            try:
-                json_part = line[6:].strip()
-                if json_part and json_part != '[DONE]':
-                    data_obj = json.loads(json_part)
-                    
-                    if isinstance(data_obj, dict):
-                        # NEW FORMAT: assistant_output directly in the object
-                        if 'assistant_output' in data_obj and data_obj['assistant_output']:
-                            output = str(data_obj['assistant_output'])
-                            # Filter out initialization messages
-                            if not any(emoji in output for emoji in ['🔄', '🔧', '📋', '🔍', '📂', '🤔', '📚', '✨']):
-                                content_parts.append(output)
-                        
-                        # OLD FORMAT: nested under 'data' key
-                        elif 'data' in data_obj and isinstance(data_obj['data'], dict):
-                            chunk_data = data_obj['data']
-                            
-                            if 'assistant_output' in chunk_data and chunk_data['assistant_output']:
-                                content_parts.append(str(chunk_data['assistant_output']))
-                            elif 'content' in chunk_data and chunk_data['content']:
-                                content_parts.append(str(chunk_data['content']))
-                            
-                            if 'sources' in chunk_data and isinstance(chunk_data['sources'], list):
-                                for source in chunk_data['sources']:
-                                    if isinstance(source, dict):
-                                        for url_field in ['page_url', 'url', 'link', 'source_url']:
-                                            if url_field in source and source[url_field]:
-                                                extracted_urls.append(source[url_field])
-                                                break
-                        
-                        # Fallback: direct content field
-                        elif 'content' in data_obj and data_obj['content']:
-                            content_parts.append(str(data_obj['content']))
-                        
-                        # Extract sources from top-level sources field
-                        if 'sources' in data_obj and isinstance(data_obj['sources'], list):
-                            for source in data_obj['sources']:
-                                if isinstance(source, dict):
-                                    for url_field in ['page_url', 'url', 'link', 'source_url']:
-                                        if url_field in source and source[url_field]:
-                                            extracted_urls.append(source[url_field])
-                                            break
-                            
-            except json.JSONDecodeError:
+    if max_workers <= 1:
+        for row_idx, prompt in jobs:
+            results[row_idx] = send_question_to_api(prompt, api_url, agent_id)
+            if on_result:
+                on_result(row_idx, results[row_idx])
+        return results
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(send_question_to_api, prompt, api_url, agent_id): row_idx
+            for row_idx, prompt in jobs
+        }
+        for completed, future in enumerate(as_completed(futures), 1):
+            row_idx = futures[future]
+            results[row_idx] = future.result()
+            if on_result:
+                on_result(row_idx, results[row_idx])
+            print(f"  ⏳ [{agent_id}] [{completed}/{len(jobs)}] Row {row_idx}: {results[row_idx]['status']}")
+    
+    return results
+
+# ===== SSE DECODING =====
+# Status/initialization chunks carry one of these emoji and are not part of the answer
+SSE_INIT_EMOJI_PATTERN = re.compile('[🔄🔧📋🔍📂🤔📚✨]')
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+SOURCE_URL_FIELDS = ('page_url', 'url', 'link', 'source_url')
+_JSON_DECODER = json.JSONDecoder()
+SSE_PARSE_SLICE_CHARS = 64 * 1024
+
+SSEEvent = namedtuple('SSEEvent', ['kind', 'data', 'raw'])
+SSEEvent.__doc__ = """
+Decoded SSE event. kind is 'json' (data is the parsed object), 'text' (data is a str
+that is not JSON) or 'done' (the [DONE] sentinel). raw is the stripped data field as bytes.
+"""
+
+class SSEDecoder:
+    """
+    Incremental Server-Sent Events decoder.
+    feed() takes raw bytes chunks as they arrive and returns the events they complete.
+    Consecutive 'data:' lines form one event (joined with newlines) until a blank line;
+    streams that put one JSON document per 'data:' line without blank separators are split
+    back into one event per line. Lines longer than max_line_bytes and events larger than
+    max_event_bytes are dropped, so memory stays bounded whatever the server sends.
+    """
+    
+    def __init__(self, max_line_bytes=1024 * 1024, max_event_bytes=4 * 1024 * 1024):
+        self.max_line_bytes = max_line_bytes
+        self.max_event_bytes = max_event_bytes
+        self.saw_data = False  # True once any 'data:' field was seen
+        self.done = False  # True once the [DONE] sentinel was seen
+        self.dropped = 0  # Oversized lines/events that were discarded
+        self._partial = b''
+        self._discarding_line = False
+        self._data_lines = []
+        self._data_size = 0
+        self._event_dropped = False
+    
+    def feed(self, chunk):
+        """Decode a bytes chunk and return the list of SSEEvents it completed"""
+        events = []
+        lines = (self._partial + chunk).split(b'\n') if self._partial else chunk.split(b'\n')
+        partial = lines.pop()
+        
+        if lines and self._discarding_line:
+            lines[0] = b':'  # Tail of an oversized line, skip it like a comment
+            self._discarding_line = False
+        
+        data_lines = self._data_lines
+        for line in lines:
+            if line[-1:] == b'\r':
+                line = line[:-1]
+            if line[:5] == b'data:':
+                value = line[6:] if line[5:6] == b' ' else line[5:]
+            elif not line:
+                if data_lines:
+                    self._dispatch(events)
+                    data_lines = self._data_lines
+                self._data_size = 0
+                self._event_dropped = False
                 continue
-                            
-            except json.JSONDecodeError:
+            elif line[:1] != b':' and line.partition(b':')[0].strip() == b'data':
+                value = line.partition(b':')[2].lstrip(b' ')
+            else:
+                # ':' comments / keep-alives and 'event', 'id', 'retry' fields are not used by the mentor APIs
                 continue
+            
+            self.saw_data = True
+            self._data_size += len(value) + 1
+            if self._data_size <= self.max_event_bytes:
+                data_lines.append(value)
+            elif not self._event_dropped:
+                # Oversized event: drop it and ignore the rest of its data lines
+                self.dropped += 1
+                self._event_dropped = True
+                data_lines.clear()
+        
+        if self._discarding_line or len(partial) > self.max_line_bytes:
+            # Drop the rest of this line instead of buffering it without limit
+            if not self._discarding_line:
+                self.dropped += 1
+            self._discarding_line = True
+            partial = b''
+        self._partial = partial
+        
+        return events
+    
+    def close(self):
+        """Flush a trailing line/event that was not terminated by a blank line"""
+        events = self.feed(b'\n') if self._partial else []
+        self._discarding_line = False
+        if self._data_lines:
+            self._dispatch(events)
+        self._data_size = 0
+        self._event_dropped = False
+        return events
     
-    text_content = ''.join(content_parts)
+    def _dispatch(self, events):
+        lines = self._data_lines
+        self._data_lines = []
+        
+        if len(lines) == 1:
+            event = self._decode(lines[0])
+            if event is not None:
+                events.append(event)
+            return
+        
+        event = self._decode(b'\n'.join(lines))
+        if event is None:
+            return
+        if event.kind != 'text':
+            events.append(event)
+            return
+        for line in lines:
+            event = self._decode(line)
+            if event is not None:
+                events.append(event)
     
-    if not text_content:
-        text_content = "SSE response: No content extracted"
+    def _decode(self, data):
+        data = data.strip()
+        if not data:
+            return None
+        if data == b'[DONE]':
+            self.done = True
+            return SSEEvent('done', None, data)
+        text = data.decode('utf-8', errors='replace')
+        try:
+            data_obj, end = _JSON_DECODER.raw_decode(text)
+            if end == len(text):
+                return SSEEvent('json', data_obj, data)
+        except ValueError:
+            pass
+        return SSEEvent('text', text, data)
+
+class SSEResponseBuilder:
+    """
+    Accumulates decoded SSE events into the standard {'status', 'response', 'sources'} result.
+    Keeps at most a handful of fallback URLs from the raw stream instead of the whole body.
+    """
     
-    if not extracted_urls and text_content:
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        content_urls = re.findall(url_pattern, text_content + response_text)
-        extracted_urls.extend(content_urls[:5])
+    MAX_FALLBACK_URLS = 5
     
-    unique_urls = list(dict.fromkeys(extracted_urls))
+    def __init__(self):
+        self.content_parts = []
+        self.extracted_urls = []
+        self.fallback_urls = []
     
-    return {'status': 'success', 'response': text_content, 'sources': unique_urls[:10]}
+    def add(self, event):
+        """Apply one SSEEvent; returns True if it added assistant content"""
+        if (not self.extracted_urls and len(self.fallback_urls) < self.MAX_FALLBACK_URLS
+                and b'http' in event.raw):
+            urls = URL_PATTERN.findall(event.raw.decode('utf-8', errors='replace'))
+            self.fallback_urls.extend(urls[:self.MAX_FALLBACK_URLS - len(self.fallback_urls)])
+        
+        if event.kind != 'json':
+            return False
+        return collect_sse_event(event.data, self.content_parts, self.extracted_urls)
+    
+    def result(self):
+        text_content = ''.join(self.content_parts)
+        
+        if not text_content:
+            text_content = "SSE response: No content extracted"
+        
+        extracted_urls = self.extracted_urls
+        if not extracted_urls:
+            extracted_urls = (URL_PATTERN.findall(text_content) + self.fallback_urls)[:5]
+        
+        unique_urls = list(dict.fromkeys(extracted_urls))
+        
+        return {'status': 'success', 'response': text_content, 'sources': unique_urls[:10]}
+
+def _extract_source_urls(sources, extracted_urls):
+    for source in sources:
+        if isinstance(source, dict):
+            for url_field in SOURCE_URL_FIELDS:
+                if source.get(url_field):
+                    extracted_urls.append(source[url_field])
+                    break
+
+def collect_sse_event(data_obj, content_parts, extracted_urls):
+    """
+    Apply one decoded SSE 'data:' object to the running content and source lists.
+    Returns True if it added assistant content.
+    """
+    if not isinstance(data_obj, dict):
+        return False
+    
+    added_content = False
+    
+    # NEW FORMAT: assistant_output directly in the object
+    output = data_obj.get('assistant_output')
+    if output:
+        output = str(output)
+        # Filter out initialization messages
+        if not SSE_INIT_EMOJI_PATTERN.search(output):
+            content_parts.append(output)
+            added_content = True
+    
+    # OLD FORMAT: nested under 'data' key
+    elif isinstance(data_obj.get('data'), dict):
+        chunk_data = data_obj['data']
+        
+        if chunk_data.get('assistant_output'):
+            content_parts.append(str(chunk_data['assistant_output']))
+            added_content = True
+        elif chunk_data.get('content'):
+            content_parts.append(str(chunk_data['content']))
+            added_content = True
+        
+        if isinstance(chunk_data.get('sources'), list):
+            _extract_source_urls(chunk_data['sources'], extracted_urls)
+    
+    # Fallback: direct content field
+    elif data_obj.get('content'):
+        content_parts.append(str(data_obj['content']))
+        added_content = True
+    
+    # Extract sources from top-level sources field
+    if isinstance(data_obj.get('sources'), list):
+        _extract_source_urls(data_obj['sources'], extracted_urls)
+    
+    return added_content
+
+def _parse_sse_text(response_text, max_line_chars=256 * 1024, max_event_chars=1024 * 1024):
+    """
+    Fast path of parse_sse_response for a body already in memory: one JSON document per 'data:' line,
+    decoded straight from the str without bytes round trips or SSEEvent objects. Returns None when the
+    body needs SSEDecoder (non-JSON or multi-line events, 'data' fields with odd spacing, oversized lines).
+    """
+    builder = SSEResponseBuilder()
+    content_parts = builder.content_parts
+    extracted_urls = builder.extracted_urls
+    fallback_urls = builder.fallback_urls
+    event_chars = 0
+    
+    # Split in slices ending at a newline so a large body is never split into lines in one piece
+    start = 0
+    while start < len(response_text):
+        end = response_text.find('\n', start + SSE_PARSE_SLICE_CHARS)
+        if end < 0:
+            end = len(response_text)
+        for line in response_text[start:end].split('\n'):
+            if line[-1:] == '\r':
+                line = line[:-1]
+            if len(line) > max_line_chars:
+                return None
+            if line[:5] != 'data:':
+                if not line:
+                    event_chars = 0
+                elif line[:1] != ':' and line.partition(':')[0].strip() == 'data':
+                    return None
+                continue
+            
+            event_chars += len(line)
+            if event_chars > max_event_chars:
+                return None
+            value = (line[6:] if line[5:6] == ' ' else line[5:]).strip()
+            if not value or value == '[DONE]':
+                continue
+            try:
+                data_obj, position = _JSON_DECODER.raw_decode(value)
+            except ValueError:
+                return None
+            if position != len(value):
+                return None
+            
+            if not extracted_urls and len(fallback_urls) < builder.MAX_FALLBACK_URLS and 'http' in value:
+                fallback_urls.extend(URL_PATTERN.findall(value)[:builder.MAX_FALLBACK_URLS - len(fallback_urls)])
+            collect_sse_event(data_obj, content_parts, extracted_urls)
+        start = end + 1
+    
+    return builder.result()
+
+def parse_sse_response(response_text):
+    """Parse SSE format response (whole-body fast path, SSEDecoder for anything unusual)"""
+    result = _parse_sse_text(response_text)
+    if result is not None:
+        return result
+    
+    decoder = SSEDecoder()
+    builder = SSEResponseBuilder()
+    
+    # Feed in slices so a large body is never copied (encoded and split) in one piece
+    for offset in range(0, len(response_text), SSE_PARSE_SLICE_CHARS):
+        for event in decoder.feed(response_text[offset:offset + SSE_PARSE_SLICE_CHARS].encode('utf-8')):
+            builder.add(event)
+    for event in decoder.close():
+        builder.add(event)
+    
+    return builder.result()
 
 def parse_json_response(response_text):
     """Parse JSON format response"""
@@ -179,108 +1201,926 @@ def parse_json_response(response_text):
     except json.JSONDecodeError as e:
         return {'status': 'error', 'response': f"JSON parse error: {str(e)}", 'sources': []}
 
+# ===== ASYNC API FUNCTIONS =====
+async def send_question_to_api_async(client, prompt, api_url, agent_id):
+    """
+    Async counterpart of send_question_to_api: rate limited, with the same retry policy.
+    'ttft', 'timing' and 'latency' in the result are those of the last attempt.
+    """
+    limiter = get_rate_limiter(agent_id)
+    breaker = get_circuit_breaker(agent_id)
+    attempt = 0
+    while True:
+        if breaker is not None and not await breaker.allow_async():
+            result = circuit_open_result()
+            break
+        if limiter is not None:
+            with profile_stage('rate limit wait'):
+                await limiter.acquire_async()
+        result = await send_question_once_async(client, prompt, api_url, agent_id)
+        attempt += 1
+        delay = should_retry(result, attempt - 1, agent_id, limiter, breaker)
+        if delay is None:
+            break
+        with profile_stage('retry backoff'):
+            await asyncio.sleep(delay)
+    
+    result['attempts'] = attempt
+    if 'timing' in result:
+        record_latency(agent_id, result['timing'])
+    return result
+
+async def send_question_once_async(client, prompt, api_url, agent_id):
+    """
+    Send a question through an httpx.AsyncClient, parsing SSE events as they stream in.
+    Adds 'ttft' (seconds to first assistant content), 'latency' (total seconds) and 'timing'
+    (see new_request_timing) to the result.
+    """
+    payload_encoded = build_api_payload(prompt, agent_id)
+    started = time.perf_counter()
+    ttft = None
+    parse_time = 0.0  # Decoding is interleaved with the network reads, so it is timed per chunk
+    timing = new_request_timing()
+    extensions = {'trace': httpx_trace(timing, started)} if ENABLE_LATENCY_METRICS else None
+    
+    try:
+        async with client.stream('POST', api_url, content=payload_encoded, headers=HEADERS, timeout=60,
+                                 extensions=extensions) as response:
+            if timing['ttfb'] is None:
+                timing['ttfb'] = time.perf_counter() - started
+            if response.status_code != 200:
+                result = http_error_result(response.status_code, response.headers.get('Retry-After'))
+            else:
+                decoder = SSEDecoder()
+                builder = SSEResponseBuilder()
+                # Keep raw bytes only until the body turns out to be SSE (JSON bodies are small)
+                raw_body = bytearray()
+                
+                async for chunk in response.aiter_bytes():
+                    timing['bytes'] += len(chunk)
+                    parse_started = time.perf_counter()
+                    events = decoder.feed(chunk)
+                    if not decoder.saw_data:
+                        raw_body += chunk
+                    elif raw_body:
+                        raw_body = bytearray()
+                    for event in events:
+                        if builder.add(event) and ttft is None:
+                            ttft = time.perf_counter() - started
+                    parse_time += time.perf_counter() - parse_started
+                
+                parse_started = time.perf_counter()
+                for event in decoder.close():
+                    builder.add(event)
+                
+                if decoder.saw_data:
+                    result = builder.result()
+                else:
+                    response_text = raw_body.decode(response.encoding or 'utf-8', errors='replace').strip()
+                    if not response_text:
+                        result = {'status': 'success', 'response': 'Empty response from API', 'sources': []}
+                    else:
+                        result = parse_json_response(response_text)
+                parse_time += time.perf_counter() - parse_started
+    
+    except httpx.TimeoutException:
+        result = {'status': 'error', 'response': 'Request timeout (60s)', 'sources': [], 'retryable': True}
+    except httpx.TransportError as e:
+        result = {'status': 'error', 'response': f"Error: {str(e)[:100]}", 'sources': [], 'retryable': True}
+    except Exception as e:
+        result = {'status': 'error', 'response': f"Error: {str(e)[:100]}", 'sources': []}
+    
+    timing['ttft'] = ttft
+    timing['total'] = time.perf_counter() - started
+    profile_add('API call', timing['total'] - parse_time)
+    profile_add('parse', parse_time)
+    result['ttft'] = ttft
+    result['latency'] = timing['total']
+    result['timing'] = timing
+    return result
+
+async def _run_prompts_async(client, jobs, api_url, agent_id, max_in_flight, on_result=None):
+    """
+    Run all jobs of one agent with at most max_in_flight streaming requests.
+    on_result runs in the loop's default executor, never on the loop itself.
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    completed = 0
+    
+    async def run_job(row_idx, prompt):
+        nonlocal completed
+        async with semaphore:
+            result = await send_question_to_api_async(client, prompt, api_url, agent_id)
+        if on_result:
+            # Checkpoint fsync and output writes run on a worker thread, so other streams keep flowing
+            await asyncio.get_running_loop().run_in_executor(None, on_result, row_idx, result)
+        completed += 1
+        timing = f" ({format_timing(result['timing'])})" if result.get('timing') else ""
+        print(f"  ⏳ [{agent_id}] [{completed}/{len(jobs)}] Row {row_idx}: {result['status']}{timing}")
+        return row_idx, result
+    
+    pairs = await asyncio.gather(*(run_job(row_idx, prompt) for row_idx, prompt in jobs))
+    return dict(pairs)
+
+def run_prompts_async(jobs, api_url, agent_id, max_in_flight=ASYNC_MAX_IN_FLIGHT, on_result=None):
+    """
+    Send (row_idx, prompt) jobs through the shared asyncio client and event loop.
+    Returns {row_idx: result}, same shape as run_prompts_concurrently.
+    """
+    runner = get_async_runner()
+    return runner.run(_run_prompts_async(runner.client, jobs, api_url, agent_id, max_in_flight, on_result))
+
+# ===== RESPONSE CACHE =====
+class ResponseCache:
+    """
+    SQLite cache of successful API results keyed by (agent_id, normalized prompt, backend version).
+    Entries expire after ttl_hours; the least recently used ones beyond max_entries are evicted.
+    Safe to share between sheet worker threads.
+    """
+    
+    def __init__(self, path=RESPONSE_CACHE_FILE, ttl_hours=RESPONSE_CACHE_TTL_HOURS,
+                 max_entries=RESPONSE_CACHE_MAX_ENTRIES, backend_version=BACKEND_VERSION):
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.backend_version = backend_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                agent_id TEXT NOT NULL,
+                backend_version TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)")
+        self._conn.commit()
+        self.evict()
+    
+    @staticmethod
+    def normalize_prompt(prompt):
+        """Case- and whitespace-insensitive form of a prompt"""
+        return ' '.join(str(prompt).split()).casefold()
+    
+    def make_key(self, agent_id, prompt):
+        key_source = '\x1f'.join([agent_id, self.normalize_prompt(prompt), self.backend_version])
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    
+    def get(self, agent_id, prompt):
+        """Return the cached result for a prompt, or None on a miss/expired entry"""
+        key = self.make_key(agent_id, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result_json FROM responses WHERE cache_key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used_at = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        
+        result = json.loads(row[0])
+        result['cached'] = True
+        return result
+    
+    def put(self, agent_id, prompt, result):
+        """Store a successful result; errors are never cached"""
+        if result.get('status') != 'success':
+            return
+        
+        key = self.make_key(agent_id, prompt)
+        stored = {'status': result['status'], 'response': result['response'], 'sources': result['sources']}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, agent_id, self.backend_version, str(prompt), json.dumps(stored), now, now)
+            )
+            self._conn.commit()
+    
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.execute("""
+                DELETE FROM responses WHERE cache_key IN (
+                    SELECT cache_key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+    
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the run's ResponseCache, or None when RESPONSE_CACHE_MODE is 'off'"""
+    global _response_cache
+    if RESPONSE_CACHE_MODE not in ('refresh', 'changed-backend-only'):
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+def close_response_cache():
+    """Evict and close the response cache at the end of the run"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            print(f"  💾 Response cache: {_response_cache.hits} hits, {_response_cache.misses} misses")
+            _response_cache.close()
+            _response_cache = None
+
+# ===== RESULTS STORE =====
+class ResultsStore:
+    """
+    SQLite history of every run: one row per (run_id, sheet, serial) with response hashes,
+    lengths, latencies and verdicts, one row per agent-wide finding, plus one row per run with its totals.
+    Response texts are not stored, only their hashes. Safe to share between sheet worker threads.
+    """
+    
+    RESULT_COLUMNS = ('run_id', 'sheet_number', 'sheet_name', 'agent_id', 'serial',
+                      'prompt_hash', 'old_response_hash', 'new_response_hash',
+                      'old_length', 'new_length', 'status', 'cached', 'ttft', 'latency', 'ttfb', 'response_bytes',
+                      'benchmark_quality', 'similarity', 'degraded', 'severity', 'reason')
+    
+    def __init__(self, path=RESULTS_STORE_FILE, backend_version=BACKEND_VERSION):
+        self.run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                backend_version TEXT NOT NULL,
+                processed INTEGER,
+                successful INTEGER,
+                degraded INTEGER,
+                high_severity INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT NOT NULL,
+                sheet_number INTEGER NOT NULL,
+                sheet_name TEXT NOT NULL,
+                agent_id TEXT NOT NULL,
+                serial INTEGER NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                old_response_hash TEXT,
+                new_response_hash TEXT,
+                old_length INTEGER NOT NULL,
+                new_length INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                cached INTEGER NOT NULL,
+                ttft REAL,
+                latency REAL,
+                ttfb REAL,
+                response_bytes INTEGER,
+                benchmark_quality TEXT,
+                similarity REAL,
+                degraded INTEGER NOT NULL,
+                severity TEXT,
+                reason TEXT,
+                PRIMARY KEY (run_id, sheet_number, serial)
+            );
+            CREATE TABLE IF NOT EXISTS agent_findings (
+                run_id TEXT NOT NULL,
+                sheet_number INTEGER NOT NULL,
+                sheet_name TEXT NOT NULL,
+                agent_id TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                reason TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_trend ON results (sheet_number, serial, run_id);
+            CREATE INDEX IF NOT EXISTS idx_agent_findings_run ON agent_findings (run_id);
+            CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+        """)
+        # Stores created before the latency metrics lack their columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        for column, column_type in [('ttfb', 'REAL'), ('response_bytes', 'INTEGER')]:
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE results ADD COLUMN {column} {column_type}")
+        self._conn.execute(
+            "INSERT INTO runs (run_id, started_at, backend_version) VALUES (?, ?, ?)",
+            (self.run_id, datetime.now().isoformat(timespec='seconds'), backend_version)
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def _text_hash(text):
+        return hashlib.sha256(str(text).encode('utf-8')).hexdigest()[:16] if text else None
+    
+    def record_sheet(self, sheet_number, sheet_name, agent_id, rows, agent_findings=()):
+        """
+        Store one sheet's rows in a single transaction.
+        Each row is a dict with serial, prompt, benchmark (entry of the benchmark index),
+        result (API result), degraded (degraded entry or None) and similarity (or None).
+        agent_findings are degraded entries about the agent as a whole (table agent_findings).
+        """
+        records = []
+        for row in rows:
+            benchmark = row['benchmark']
+            result = row['result']
+            degraded = row['degraded']
+            old_response = benchmark.get('response', '')
+            new_response = result['response'] if result['status'] == 'success' else ''
+            timing = result.get('timing') or {}
+            records.append((
+                self.run_id, sheet_number, sheet_name, agent_id, row['serial'],
+                self._text_hash(row['prompt']), self._text_hash(old_response), self._text_hash(new_response),
+                len(old_response), len(new_response), result['status'], int(bool(result.get('cached'))),
+                result.get('ttft'), result.get('latency'), timing.get('ttfb'), timing.get('bytes'),
+                benchmark.get('quality', 'unknown'), row['similarity'],
+                int(degraded is not None),
+                degraded['severity'] if degraded else None,
+                degraded['reason'] if degraded else None
+            ))
+        
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(self.RESULT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self.RESULT_COLUMNS))})",
+                records
+            )
+            self._conn.executemany(
+                "INSERT INTO agent_findings (run_id, sheet_number, sheet_name, agent_id, severity, reason) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(self.run_id, sheet_number, sheet_name, agent_id, entry['severity'], entry['reason'])
+                 for entry in agent_findings]
+            )
+            self._conn.commit()
+    
+    def latency_history(self, sheet_number, runs=LATENCY_BASELINE_RUNS):
+        """{serial: [latency]} of a sheet's successful, uncached answers in the last finished runs before this one"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT serial, latency FROM results
+                WHERE sheet_number = ? AND status = 'success' AND cached = 0 AND latency IS NOT NULL
+                  AND run_id IN (
+                      SELECT run_id FROM runs WHERE finished_at IS NOT NULL AND run_id != ?
+                      ORDER BY started_at DESC LIMIT ?
+                  )
+            """, (sheet_number, self.run_id, runs)).fetchall()
+        
+        history = {}
+        for serial, latency in rows:
+            history.setdefault(serial, []).append(latency)
+        return history
+    
+    def finish_run(self, processed, successful):
+        """Record the run's totals; degradation counts are taken from the stored rows"""
+        with self._lock:
+            self._conn.execute("""
+                UPDATE runs SET
+                    finished_at = ?,
+                    processed = ?,
+                    successful = ?,
+                    degraded = (SELECT COUNT(*) FROM results WHERE run_id = ? AND degraded = 1)
+                             + (SELECT COUNT(*) FROM agent_findings WHERE run_id = ?),
+                    high_severity = (SELECT COUNT(*) FROM results WHERE run_id = ? AND severity = 'HIGH')
+                                  + (SELECT COUNT(*) FROM agent_findings WHERE run_id = ? AND severity = 'HIGH')
+                WHERE run_id = ?
+            """, (datetime.now().isoformat(timespec='seconds'), processed, successful,
+                  self.run_id, self.run_id, self.run_id, self.run_id, self.run_id))
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+def get_results_store():
+    """Return the run's ResultsStore, or None when ENABLE_RESULTS_STORE is off"""
+    global _results_store
+    if not ENABLE_RESULTS_STORE:
+        return None
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore()
+        return _results_store
+
+def close_results_store(processed, successful):
+    """Record the run totals and close the results store"""
+    global _results_store
+    with _results_store_lock:
+        if _results_store is not None:
+            _results_store.finish_run(processed, successful)
+            print(f"  💾 Run {_results_store.run_id} recorded in {RESULTS_STORE_FILE}")
+            _results_store.close()
+            _results_store = None
+
+# ===== CHECKPOINT / RESUME =====
+class RunCheckpoint:
+    """
+    Append-only JSONL journal of completed prompt results, one line per (agent, serial).
+    Lines are flushed and fsynced as results arrive, so a killed run loses nothing already answered.
+    On resume only successful results younger than max_age_hours are reused; the rest are asked again.
+    resume='auto' resumes when a journal exists. A journal that is not resumed is kept as <path>.prev.
+    """
+    
+    def __init__(self, path=CHECKPOINT_FILE, resume=False, max_age_hours=CHECKPOINT_MAX_AGE_HOURS):
+        self.path = path
+        self.completed = {}
+        self._lock = threading.Lock()
+        
+        if resume == 'auto':
+            resume = os.path.exists(path)
+        
+        if resume and os.path.exists(path):
+            cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat(timespec='seconds')
+            stale = 0
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partially written last line of a killed run
+                    if entry.get('recorded_at', '') < cutoff:
+                        stale += 1
+                        continue
+                    self.completed[(entry['agent_id'], entry['serial'])] = entry
+            print(f"♻️  Resuming: {len(self.completed)} results loaded from {path}"
+                  + (f" ({stale} older than {max_age_hours}h ignored)" if stale else ""))
+        elif os.path.exists(path):
+            # Never destroy an interrupted run's progress silently
+            os.replace(path, f"{path}.prev")
+            print(f"⚠️  Previous checkpoint {path} was not resumed; kept as {path}.prev "
+                  f"(rename it back and use --resume to continue it)")
+        
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+    
+    @staticmethod
+    def _prompt_hash(prompt):
+        return hashlib.sha256(str(prompt).encode('utf-8')).hexdigest()[:16]
+    
+    def get(self, agent_id, serial, prompt):
+        """Return the journaled successful result for this row, if the prompt is unchanged"""
+        entry = self.completed.get((agent_id, serial))
+        if entry is None or entry['prompt_hash'] != self._prompt_hash(prompt):
+            return None
+        if entry['result'].get('status') != 'success':
+            return None
+        return entry['result']
+    
+    def record(self, agent_id, serial, prompt, result):
+        """Append one completed result to the journal"""
+        entry = {
+            'agent_id': agent_id,
+            'serial': serial,
+            'prompt_hash': self._prompt_hash(prompt),
+            'result': result,
+            'recorded_at': datetime.now().isoformat(timespec='seconds')
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+    
+    def close(self, finished=False):
+        """Close the journal; a finished run removes it so the next run starts fresh"""
+        with self._lock:
+            self._file.close()
+        if finished and os.path.exists(self.path):
+            os.remove(self.path)
+
+# ===== SIMILARITY FUNCTIONS =====
+SIMILARITY_TOKEN_PATTERN = re.compile(r'\w+')
+
+def hashed_ngram_buckets(text):
+    """Stable hash buckets of the word unigrams and bigrams of a text"""
+    tokens = SIMILARITY_TOKEN_PATTERN.findall(str(text).lower())
+    ngrams = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    return [zlib.crc32(ngram.encode('utf-8')) % SIMILARITY_DIMENSIONS for ngram in ngrams]
+
+def term_frequency_matrix(texts):
+    """Sublinear (1 + log count) hashed n-gram frequencies, one row per text"""
+    matrix = np.zeros((len(texts), SIMILARITY_DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets = hashed_ngram_buckets(text)
+        if not buckets:
+            continue
+        counts = np.bincount(buckets, minlength=SIMILARITY_DIMENSIONS)
+        present = counts > 0
+        matrix[row, present] = 1 + np.log(counts[present])
+    return matrix
+
+def normalize_rows(matrix):
+    """Scale every row to unit length (all-zero rows stay zero)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def build_benchmark_vectors(benchmark_data):
+    """
+    TF-IDF vectors of one sheet's benchmark responses.
+    Returns (serials, idf, vectors) where vectors[i] is the unit vector of serials[i].
+    """
+    serials = sorted(serial for serial, entry in benchmark_data.items() if entry.get('response'))
+    frequencies = term_frequency_matrix([benchmark_data[serial]['response'] for serial in serials])
+    document_frequency = np.count_nonzero(frequencies, axis=0)
+    idf = (np.log((1 + len(serials)) / (1 + document_frequency)) + 1).astype(np.float32)
+    return np.array(serials, dtype=np.int64), idf, normalize_rows(frequencies * idf)
+
+def read_benchmark_vectors(benchmark_hash):
+    """Return the cached {sheet_number: (serials, idf, vectors)} for this compare.xlsx hash, or None"""
+    if not os.path.exists(BENCHMARK_VECTORS_FILE):
+        return None
+    
+    try:
+        with np.load(BENCHMARK_VECTORS_FILE, allow_pickle=False) as stored:
+            # Files written before the format field count as format 0
+            stored_format = int(stored['format']) if 'format' in stored.files else 0
+            if (stored_format != BENCHMARK_VECTORS_FORMAT or str(stored['benchmark_sha256']) != benchmark_hash
+                    or int(stored['dimensions']) != SIMILARITY_DIMENSIONS):
+                return None
+            return {
+                int(sheet_number): (stored[f'serials_{sheet_number}'], stored[f'idf_{sheet_number}'], stored[f'vectors_{sheet_number}'])
+                for sheet_number in stored['sheets']
+            }
+    except Exception as e:
+        print(f"  ⚠️  Ignoring unreadable benchmark vectors: {e}")
+        return None
+
+def save_benchmark_vectors(benchmark_hash, benchmark_vectors):
+    """Write the vectors next to compare.xlsx (atomically), keeping other cached sheets"""
+    sheets = read_benchmark_vectors(benchmark_hash) or {}
+    sheets.update(benchmark_vectors)
+    
+    arrays = {
+        'format': np.array(BENCHMARK_VECTORS_FORMAT),
+        'benchmark_sha256': np.array(benchmark_hash),
+        'dimensions': np.array(SIMILARITY_DIMENSIONS),
+        'sheets': np.array(sorted(sheets), dtype=np.int64)
+    }
+    for sheet_number, (serials, idf, vectors) in sheets.items():
+        arrays[f'serials_{sheet_number}'] = serials
+        arrays[f'idf_{sheet_number}'] = idf
+        arrays[f'vectors_{sheet_number}'] = vectors
+    
+    temp_file = f"{BENCHMARK_VECTORS_FILE}.tmp"
+    with open(temp_file, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(temp_file, BENCHMARK_VECTORS_FILE)
+
+def load_benchmark_vectors(benchmark_index):
+    """
+    TF-IDF vectors for the benchmark responses of every sheet in benchmark_index.
+    Vectors are built once and cached in BENCHMARK_VECTORS_FILE until compare.xlsx or BENCHMARK_VECTORS_FORMAT changes.
+    Returns {sheet_number: (serials, idf, vectors)}, or None when SIMILARITY_ENGINE is not 'tfidf'.
+    """
+    if SIMILARITY_ENGINE != 'tfidf':
+        return None
+    if np is None:
+        print(f"  ⚠️  numpy not installed, falling back to word overlap similarity")
+        return None
+    
+    try:
+        benchmark_hash = file_sha256(BENCHMARK_FILE)
+    except FileNotFoundError:
+        return None
+    
+    cached = read_benchmark_vectors(benchmark_hash)
+    if cached is not None and all(sheet_number in cached for sheet_number in benchmark_index):
+        print(f"\n🧮 Benchmark vectors loaded from {BENCHMARK_VECTORS_FILE}")
+        return {sheet_number: cached[sheet_number] for sheet_number in benchmark_index}
+    
+    benchmark_vectors = {
+        sheet_number: build_benchmark_vectors(benchmark_data)
+        for sheet_number, benchmark_data in benchmark_index.items()
+    }
+    total = sum(len(serials) for serials, _, _ in benchmark_vectors.values())
+    print(f"\n🧮 Vectorized {total} benchmark responses (TF-IDF, {SIMILARITY_DIMENSIONS} dimensions)")
+    
+    try:
+        save_benchmark_vectors(benchmark_hash, benchmark_vectors)
+        print(f"  💾 Benchmark vectors saved to {BENCHMARK_VECTORS_FILE}")
+    except OSError as e:
+        print(f"  ⚠️  Could not write benchmark vectors: {e}")
+    
+    return benchmark_vectors
+
+def score_similarity_batch(sheet_vectors, serials, new_responses):
+    """
+    Cosine similarity of each new response to the benchmark response with the same serial.
+    All new responses of a sheet are vectorized and scored in one matrix operation.
+    Returns a list aligned with serials, None where the serial has no benchmark vector.
+    """
+    benchmark_serials, idf, vectors = sheet_vectors
+    positions = {int(serial): position for position, serial in enumerate(benchmark_serials)}
+    similarities = [None] * len(serials)
+    
+    matched = [(idx, positions[serial]) for idx, serial in enumerate(serials) if serial in positions]
+    if not matched:
+        return similarities
+    
+    new_vectors = normalize_rows(term_frequency_matrix([new_responses[idx] for idx, _ in matched]) * idf)
+    scores = np.einsum('ij,ij->i', new_vectors, vectors[[position for _, position in matched]])
+    for (idx, _), score in zip(matched, scores.tolist()):
+        similarities[idx] = score
+    return similarities
+
 # ===== COMPARISON FUNCTIONS =====
+# Indicator phrases, matched as lowercase substrings (compiled once into single alternations)
+ERROR_INDICATORS = ['error', 'timeout', 'http ', 'failed', 'exception', 'empty response']
+GENERIC_RESPONSES = [
+    "i don't have information",
+    "i cannot help",
+    "i don't know",
+    "no information available",
+    "unable to provide",
+    "sorry, i can't",
+    "i'm not sure"
+]
+ERROR_INDICATOR_PATTERN = re.compile('|'.join(map(re.escape, ERROR_INDICATORS)))
+GENERIC_RESPONSE_PATTERN = re.compile('|'.join(map(re.escape, GENERIC_RESPONSES)))
+
+def score_responses_batch(items, similarities=None):
+    """
+    Score a whole sheet of responses against their benchmarks in one pass.
+    items is a list of (old_response, new_response, prompt, old_quality) tuples.
+    similarities (from score_similarity_batch) replaces the word overlap of check 6 where not None.
+    Each text is normalized once; the checks of is_response_degraded then run as a cascade
+    over the whole batch, each computing its metric array only for the items still undecided.
+    Returns a list of (is_degraded: bool, reason: str, severity: str), one per item.
+    """
+    verdicts = [(False, "", "")] * len(items)
+    
+    # Normalize every text once; empty pairs and BAD benchmarks are never degradations
+    pending, old_lengths, new_lengths, old_lowers, new_texts, new_lowers, qualities, prompts = [], {}, {}, {}, {}, {}, {}, {}
+    for idx, (old_response, new_response, prompt, old_quality) in enumerate(items):
+        if not old_response or not new_response or old_quality == "bad":
+            continue
+        old_text = str(old_response).strip()
+        new_text = str(new_response).strip()
+        pending.append(idx)
+        old_lengths[idx] = len(old_text)
+        new_lengths[idx] = len(new_text)
+        old_lowers[idx] = old_text.lower()
+        new_texts[idx] = new_text
+        new_lowers[idx] = new_text.lower()
+        qualities[idx] = old_quality
+        prompts[idx] = prompt
+    
+    def severity(idx):
+        # More severe if old was marked as good
+        return "HIGH" if qualities[idx] == "good" else "MEDIUM"
+    
+    def apply_check(flags, reason, severity_for):
+        """Record verdicts for flagged pending items and return the ones still undecided"""
+        still_pending = []
+        for idx, flagged in zip(pending, flags):
+            if flagged:
+                verdicts[idx] = (True, reason(idx) if callable(reason) else reason, severity_for(idx))
+            else:
+                still_pending.append(idx)
+        return still_pending
+    
+    # Check 1: Error responses
+    flags = [ERROR_INDICATOR_PATTERN.search(new_lowers[idx]) is not None
+             and ERROR_INDICATOR_PATTERN.search(old_lowers[idx]) is None for idx in pending]
+    pending = apply_check(flags, "New response contains error, old response was valid", severity)
+    
+    # Check 2: Significantly shorter response (>50% shorter)
+    flags = [new_lengths[idx] < old_lengths[idx] * 0.5 and old_lengths[idx] > 100 for idx in pending]
+    pending = apply_check(
+        flags,
+        lambda idx: f"Response significantly shorter (Old: {old_lengths[idx]} chars, New: {new_lengths[idx]} chars)",
+        severity
+    )
+    
+    # Check 3: Generic/unhelpful responses
+    flags = [old_lengths[idx] > 50 and GENERIC_RESPONSE_PATTERN.search(new_lowers[idx]) is not None
+             and GENERIC_RESPONSE_PATTERN.search(old_lowers[idx]) is None for idx in pending]
+    pending = apply_check(flags, "New response is generic/unhelpful, old response was specific", severity)
+    
+    # Check 4: Missing key terms from prompt (first 5 significant words)
+    keywords = {idx: [word for word in str(prompts[idx]).lower().split() if len(word) > 4][:5] for idx in pending}
+    old_counts = {idx: sum(1 for kw in keywords[idx] if kw in old_lowers[idx]) for idx in pending}
+    new_counts = {idx: sum(1 for kw in keywords[idx] if kw in new_lowers[idx]) for idx in pending}
+    flags = [new_counts[idx] < old_counts[idx] * 0.5 and old_counts[idx] >= 2 for idx in pending]
+    pending = apply_check(
+        flags,
+        lambda idx: f"New response less relevant (Old: {old_counts[idx]} keywords, New: {new_counts[idx]} keywords)",
+        lambda idx: "MEDIUM"
+    )
+    
+    # Tokenize the remaining new responses once for checks 5 and 6
+    new_tokens = {idx: new_texts[idx].split() for idx in pending}
+    
+    # Check 5: Repetitive content (less than 30% unique words)
+    flags = [new_lengths[idx] > 100 and bool(new_tokens[idx])
+             and len(set(new_tokens[idx])) / len(new_tokens[idx]) < 0.3 for idx in pending]
+    pending = apply_check(flags, "New response is highly repetitive", lambda idx: "MEDIUM")
+    
+    # Check 6: If old was marked as "good" and new differs significantly
+    # (TF-IDF cosine below SIMILARITY_THRESHOLD when scored, else less than 30% word overlap)
+    flags = []
+    reasons = {}
+    for idx in pending:
+        if qualities[idx] != "good" or old_lengths[idx] <= 100:
+            flags.append(False)
+            continue
+        
+        similarity = similarities[idx] if similarities is not None else None
+        if similarity is not None:
+            flags.append(similarity < SIMILARITY_THRESHOLD)
+            reasons[idx] = f"New response differs significantly from GOOD benchmark (TF-IDF similarity {similarity:.2f})"
+            continue
+        
+        old_words = set(old_lowers[idx].split())
+        new_words = set(map(str.lower, new_tokens[idx]))
+        flags.append(bool(old_words) and len(old_words & new_words) / len(old_words) < 0.3)
+        reasons[idx] = "New response differs significantly from GOOD benchmark (low word overlap)"
+    apply_check(flags, lambda idx: reasons[idx], lambda idx: "MEDIUM")
+    
+    return verdicts
+
 def is_response_degraded(old_response, new_response, prompt, old_quality="unknown"):
     """
     Determine if new response is objectively worse than old response.
     Takes into account the quality marking from benchmark (good/neutral/bad).
     Returns (is_degraded: bool, reason: str, severity: str)
     """
+    return score_responses_batch([(old_response, new_response, prompt, old_quality)])[0]
+
+def latency_baseline(history, benchmark_latency=None):
+    """
+    Baseline latencies of one prompt: its stored latencies from recent runs, or the benchmark's
+    recorded latency while fewer than LATENCY_MIN_SAMPLES runs are stored
+    """
+    if len(history) >= LATENCY_MIN_SAMPLES or benchmark_latency is None:
+        return list(history)
+    return [benchmark_latency]
+
+def latency_severity(slowdown):
+    return "HIGH" if slowdown >= LATENCY_HIGH_SLOWDOWN_RATIO else LATENCY_SEVERITY
+
+def is_latency_degraded(latency, baseline):
+    """
+    Determine if an answer took much longer than its baseline latencies (see latency_baseline).
+    It must be LATENCY_SLOWDOWN_RATIO times and LATENCY_MIN_SLOWDOWN seconds slower than the baseline
+    median and, once LATENCY_MIN_SAMPLES latencies are stored, LATENCY_Z_THRESHOLD deviations above their mean.
+    Returns (is_degraded: bool, reason: str, severity: str)
+    """
+    if latency is None or not baseline:
+        return False, "", ""
     
-    if not old_response or not new_response:
+    reference = statistics.median(baseline)
+    if reference <= 0 or latency < reference * LATENCY_SLOWDOWN_RATIO or latency - reference < LATENCY_MIN_SLOWDOWN:
         return False, "", ""
     
-    old_response = str(old_response).strip()
-    new_response = str(new_response).strip()
+    detail = ""
+    if len(baseline) >= LATENCY_MIN_SAMPLES:
+        deviation = statistics.stdev(baseline)
+        z_score = (latency - statistics.mean(baseline)) / deviation if deviation > 0 else float('inf')
+        if z_score < LATENCY_Z_THRESHOLD:
+            return False, "", ""
+        detail = f", z-score {z_score:.1f}" if deviation > 0 else ""
     
-    # SPECIAL CASE: If old response was marked as "bad", new response is improvement
-    if old_quality == "bad":
-        print(f"    ℹ️  Old response was marked BAD - any new response is potential improvement")
+    slowdown = latency / reference
+    reason = f"Latency regression: {latency:.1f}s vs {reference:.1f}s baseline ({slowdown:.1f}x slower{detail})"
+    return True, reason, latency_severity(slowdown)
+
+def is_agent_latency_degraded(latencies, baseline):
+    """
+    Determine if an agent's p90 latency over this run's answers grew by LATENCY_P90_SLOWDOWN_RATIO
+    (and LATENCY_MIN_SLOWDOWN seconds) over the p90 of its baseline latencies.
+    Returns (is_degraded: bool, reason: str, severity: str)
+    """
+    if len(latencies) < LATENCY_MIN_SAMPLES or len(baseline) < LATENCY_MIN_SAMPLES:
         return False, "", ""
     
-    # Check 1: Error responses
-    error_indicators = ['error', 'timeout', 'http ', 'failed', 'exception', 'empty response']
-    new_has_error = any(indicator in new_response.lower() for indicator in error_indicators)
-    old_has_error = any(indicator in old_response.lower() for indicator in error_indicators)
+    current = percentile(sorted(latencies), 90)
+    reference = percentile(sorted(baseline), 90)
+    if reference <= 0 or current < reference * LATENCY_P90_SLOWDOWN_RATIO or current - reference < LATENCY_MIN_SLOWDOWN:
+        return False, "", ""
     
-    if new_has_error and not old_has_error:
-        severity = "HIGH" if old_quality == "good" else "MEDIUM"
-        return True, "New response contains error, old response was valid", severity
+    slowdown = current / reference
+    reason = f"Agent latency regression: p90 {current:.1f}s vs {reference:.1f}s baseline ({slowdown:.1f}x slower)"
+    return True, reason, latency_severity(slowdown)
+
+# ===== EXCEL FUNCTIONS =====
+def file_sha256(path):
+    """Content hash of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_compiled_benchmark_index(benchmark_hash):
+    """Return the cached {sheet_number: data} compiled from this compare.xlsx hash, or None"""
+    if not os.path.exists(BENCHMARK_INDEX_CACHE_FILE):
+        return None
     
-    # Check 2: Significantly shorter response (>50% shorter)
-    if len(new_response) < len(old_response) * 0.5 and len(old_response) > 100:
-        # More severe if old was marked as good
-        severity = "HIGH" if old_quality == "good" else "MEDIUM"
-        return True, f"Response significantly shorter (Old: {len(old_response)} chars, New: {len(new_response)} chars)", severity
+    try:
+        with open(BENCHMARK_INDEX_CACHE_FILE, 'rb') as f:
+            compiled = pickle.load(f)
+    except Exception as e:
+        print(f"  ⚠️  Ignoring unreadable benchmark index cache: {e}")
+        return None
     
-    # Check 3: Generic/unhelpful responses
-    generic_responses = [
-        "i don't have information",
-        "i cannot help",
-        "i don't know",
-        "no information available",
-        "unable to provide",
-        "sorry, i can't",
-        "i'm not sure"
-    ]
-    new_is_generic = any(generic in new_response.lower() for generic in generic_responses)
-    old_is_generic = any(generic in old_response.lower() for generic in generic_responses)
+    # Indexes written before the format field count as format 1
+    if compiled.get('format', 1) != BENCHMARK_INDEX_FORMAT or compiled.get('benchmark_sha256') != benchmark_hash:
+        return None
+    return compiled['sheets']
+
+def save_compiled_benchmark_index(benchmark_hash, benchmark_index):
+    """Write the parsed index next to compare.xlsx (atomically), keeping other cached sheets"""
+    sheets = read_compiled_benchmark_index(benchmark_hash) or {}
+    sheets.update(benchmark_index)
     
-    if new_is_generic and not old_is_generic and len(old_response) > 50:
-        severity = "HIGH" if old_quality == "good" else "MEDIUM"
-        return True, "New response is generic/unhelpful, old response was specific", severity
+    temp_file = f"{BENCHMARK_INDEX_CACHE_FILE}.tmp"
+    with open(temp_file, 'wb') as f:
+        pickle.dump({'format': BENCHMARK_INDEX_FORMAT, 'benchmark_sha256': benchmark_hash, 'sheets': sheets}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, BENCHMARK_INDEX_CACHE_FILE)
+
+def load_benchmark_index(sheet_numbers):
+    """
+    Load benchmark responses for all given sheets from compare.xlsx in one pass.
+    The file is opened once in read-only (streaming) mode; the result is an in-memory
+    index {sheet_number: {serial: entry}} that is shared by all sheet workers.
+    With ENABLE_BENCHMARK_INDEX_CACHE the parsed index is cached in BENCHMARK_INDEX_CACHE_FILE
+    and reused until the content hash of compare.xlsx or BENCHMARK_INDEX_FORMAT changes.
+    """
+    benchmark_index = {sheet_number: {} for sheet_number in sheet_numbers}
     
-    # Check 4: Missing key terms from prompt
-    prompt_lower = prompt.lower()
-    prompt_keywords = [word for word in prompt_lower.split() if len(word) > 4][:5]  # First 5 significant words
+    try:
+        benchmark_hash = file_sha256(BENCHMARK_FILE)
+    except FileNotFoundError:
+        print(f"  ❌ Benchmark file not found: {BENCHMARK_FILE}")
+        return benchmark_index
     
-    old_keyword_count = sum(1 for kw in prompt_keywords if kw in old_response.lower())
-    new_keyword_count = sum(1 for kw in prompt_keywords if kw in new_response.lower())
+    if ENABLE_BENCHMARK_INDEX_CACHE:
+        compiled = read_compiled_benchmark_index(benchmark_hash)
+        if compiled is not None and all(sheet_number in compiled for sheet_number in sheet_numbers):
+            benchmark_index = {sheet_number: compiled[sheet_number] for sheet_number in sheet_numbers}
+            total = sum(len(data) for data in benchmark_index.values())
+            print(f"\n📚 Benchmark index loaded from {BENCHMARK_INDEX_CACHE_FILE} ({total} responses)")
+            return benchmark_index
     
-    if new_keyword_count < old_keyword_count * 0.5 and old_keyword_count >= 2:
-        severity = "MEDIUM"
-        return True, f"New response less relevant (Old: {old_keyword_count} keywords, New: {new_keyword_count} keywords)", severity
+    wb = openpyxl.load_workbook(BENCHMARK_FILE, read_only=True)
     
-    # Check 5: Repetitive content
-    if len(new_response) > 100:
-        words = new_response.split()
-        unique_words = len(set(words))
-        if len(words) > 0 and unique_words / len(words) < 0.3:  # Less than 30% unique words
-            return True, "New response is highly repetitive", "MEDIUM"
+    try:
+        sheetnames = wb.sheetnames
+        for sheet_number in sheet_numbers:
+            if sheet_number < 1 or sheet_number > len(sheetnames):
+                continue
+            
+            ws = wb[sheetnames[sheet_number - 1]]
+            # Don't trust the stored sheet dimensions, read every row that is actually there
+            ws.reset_dimensions()
+            
+            print(f"\n📚 Benchmark sheet {sheet_number}: {sheetnames[sheet_number - 1]}")
+            benchmark_index[sheet_number] = parse_benchmark_rows(ws.iter_rows(values_only=True))
+    except Exception as e:
+        print(f"  ❌ Error loading benchmark: {e}")
+        import traceback
+        traceback.print_exc()
+        return benchmark_index
+    finally:
+        wb.close()
     
-    # Check 6: If old was marked as "good" and new differs significantly
-    if old_quality == "good":
-        # Calculate similarity (simple word overlap)
-        old_words = set(old_response.lower().split())
-        new_words = set(new_response.lower().split())
-        
-        if len(old_words) > 0:
-            overlap = len(old_words & new_words) / len(old_words)
-            if overlap < 0.3 and len(old_response) > 100:  # Less than 30% word overlap
-                return True, "New response differs significantly from GOOD benchmark (low word overlap)", "MEDIUM"
+    if ENABLE_BENCHMARK_INDEX_CACHE:
+        try:
+            save_compiled_benchmark_index(benchmark_hash, benchmark_index)
+            print(f"  💾 Benchmark index compiled to {BENCHMARK_INDEX_CACHE_FILE}")
+        except OSError as e:
+            print(f"  ⚠️  Could not write benchmark index cache: {e}")
     
-    # No degradation detected
-    return False, "", ""
+    return benchmark_index
 
-# ===== EXCEL FUNCTIONS =====
 def load_benchmark_data(sheet_number):
+    """Load benchmark responses for a single sheet (see load_benchmark_index)"""
+    return load_benchmark_index([sheet_number])[sheet_number]
+
+def parse_benchmark_rows(rows):
     """
-    Load benchmark responses from compare.xlsx with quality markings.
+    Parse benchmark rows (tuples of cell values, header first) with quality markings.
     Scans all columns to understand structure including good/neutral/bad markings.
     """
     try:
-        wb = openpyxl.load_workbook(BENCHMARK_FILE)
-        sheetnames = wb.sheetnames
-        
-        if sheet_number < 1 or sheet_number > len(sheetnames):
-            return {}
-        
-        ws = wb[sheetnames[sheet_number - 1]]
-        
         print(f"  📊 Analyzing benchmark sheet structure...")
         
         # First, scan the header row to understand column structure
-        header_row = list(ws.iter_rows(min_row=1, max_row=1, values_only=True))[0]
+        header_row = next(rows, ())
         print(f"  📋 Columns found: {len(header_row)}")
         
         # Map column names to indices
@@ -297,6 +2137,7 @@ def load_benchmark_data(sheet_number):
         sources_col = None
         quality_col = None
         rating_col = None
+        latency_col = None
         
         # Look for prompt column
         for key in ['prompt', 'question', 'query']:
@@ -330,6 +2171,13 @@ def load_benchmark_data(sheet_number):
                 print(f"  ⭐ Rating column found: Col {rating_col}")
                 break
         
+        # Look for a latency column (recorded by earlier runs, see LATENCY_COLUMN_HEADER)
+        for key in [LATENCY_COLUMN_HEADER.lower(), 'latency', 'response time (s)', 'response time']:
+            if key in col_mapping:
+                latency_col = col_mapping[key]
+                print(f"  ⏱️  Latency column found: Col {latency_col}")
+                break
+        
         # If no explicit column names, use positional defaults
         if not prompt_col:
             prompt_col = 2  # Column B
@@ -344,20 +2192,28 @@ def load_benchmark_data(sheet_number):
         benchmark_data = {}
         
         # Load data rows
-        for row_idx, row in enumerate(ws.iter_rows(min_row=2), 1):
-            prompt = row[prompt_col - 1].value if prompt_col <= len(row) else None
-            response = row[response_col - 1].value if response_col <= len(row) else None
-            sources = row[sources_col - 1].value if sources_col <= len(row) else None
+        for row_idx, row in enumerate(rows, 1):
+            prompt = row[prompt_col - 1] if prompt_col <= len(row) else None
+            response = row[response_col - 1] if response_col <= len(row) else None
+            sources = row[sources_col - 1] if sources_col <= len(row) else None
             
             # Get quality marking if available
             quality_mark = None
             if quality_col and quality_col <= len(row):
-                quality_mark = str(row[quality_col - 1].value).lower() if row[quality_col - 1].value else None
+                quality_mark = str(row[quality_col - 1]).lower() if row[quality_col - 1] else None
             
             # Get rating if available
             rating = None
             if rating_col and rating_col <= len(row):
-                rating = str(row[rating_col - 1].value).lower() if row[rating_col - 1].value else None
+                rating = str(row[rating_col - 1]).lower() if row[rating_col - 1] else None
+            
+            # Get benchmark latency if available
+            latency = None
+            if latency_col and latency_col <= len(row) and row[latency_col - 1] not in (None, ''):
+                try:
+                    latency = float(row[latency_col - 1])
+                except (TypeError, ValueError):
+                    latency = None
             
             # Determine overall quality
             quality_status = "unknown"
@@ -384,7 +2240,8 @@ def load_benchmark_data(sheet_number):
                     'sources': str(sources) if sources else "",
                     'quality': quality_status,
                     'quality_mark': quality_mark,
-                    'rating': rating
+                    'rating': rating,
+                    'latency': latency
                 }
         
         # Count by quality
@@ -400,78 +2257,395 @@ def load_benchmark_data(sheet_number):
         
         return benchmark_data
         
-    except FileNotFoundError:
-        print(f"  ❌ Benchmark file not found: {BENCHMARK_FILE}")
-        return {}
     except Exception as e:
         print(f"  ❌ Error loading benchmark: {e}")
         import traceback
         traceback.print_exc()
         return {}
 
-def create_degraded_responses_sheet(wb, sheet_name):
-    """Create or get sheet for degraded responses"""
-    if sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        ws.delete_rows(1, ws.max_row)
-    else:
-        ws = wb.create_sheet(sheet_name)
-    
-    # Style definitions
-    header_font = Font(bold=True, size=12, color="FFFFFF")
-    header_fill = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")  # Red
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    # Create headers
-    headers = ["Serial Number", "Prompt", "Old Response (Benchmark)", "New Response", 
-               "Old Sources", "New Sources", "Benchmark Quality", "Degradation Reason", "Severity"]
-    ws.append(headers)
-    
-    # Style header row
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Set column widths with autofit
-    ws.column_dimensions['A'].width = 15
-    ws.column_dimensions['B'].width = 50
-    ws.column_dimensions['C'].width = 60
-    ws.column_dimensions['D'].width = 60
-    ws.column_dimensions['E'].width = 40
-    ws.column_dimensions['F'].width = 40
-    ws.column_dimensions['G'].width = 20
-    ws.column_dimensions['H'].width = 50
-    ws.column_dimensions['I'].width = 15
-    
-    # Set row height for header
+# Degraded report layout
+DEGRADED_REPORT_HEADERS = ["Serial Number", "Prompt", "Old Response (Benchmark)", "New Response",
+                           "Old Sources", "New Sources", "Benchmark Quality", "Degradation Reason", "Severity"]
+DEGRADED_REPORT_WIDTHS = [15, 50, 60, 60, 40, 40, 20, 50, 15]
+DEGRADED_REPORT_HEIGHT_COLUMNS = (1, 2, 3, 7)  # Prompt, Old Response, New Response, Reason
+
+# Style definitions, shared by every report cell
+REPORT_HEADER_FONT = Font(bold=True, size=12, color="FFFFFF")
+REPORT_HEADER_FILL = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")  # Red
+REPORT_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center", wrap_text=True)
+REPORT_CELL_ALIGNMENT = Alignment(wrap_text=True, vertical="top")
+REPORT_HIGH_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")  # Light red
+REPORT_MEDIUM_FILL = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")  # Light yellow
+
+def degraded_report_row(issue):
+    """Cell values of one degraded response, in DEGRADED_REPORT_HEADERS order"""
+    quality_display = f"{issue.get('old_quality', 'unknown').upper()}"
+    if issue.get('old_quality_mark'):
+        quality_display += f" ({issue['old_quality_mark']})"
+    
+    return [
+        issue['serial'],
+        issue['prompt'],
+        issue['old_response'],
+        issue['new_response'],
+        issue['old_sources'],
+        issue['new_sources'],
+        quality_display,
+        issue['reason'],
+        issue['severity']
+    ]
+
+def degraded_report_row_height(row_data):
+    """Estimate a row height from the text lengths and column widths"""
+    max_lines = 1
+    for col_idx in DEGRADED_REPORT_HEIGHT_COLUMNS:
+        if row_data[col_idx]:
+            max_lines = max(max_lines, len(str(row_data[col_idx])) / DEGRADED_REPORT_WIDTHS[col_idx])
+    
+    # Set minimum row height with some padding
+    return max(30, min(max_lines * 15, 200))
+
+def report_style(ws, **styles):
+    """Register a style combination with the workbook once; returns the style array to copy onto cells"""
+    cell = WriteOnlyCell(ws)
+    for name, value in styles.items():
+        setattr(cell, name, value)
+    return cell._style
+
+def styled_cell(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    cell._style = copy(style)
+    return cell
+
+def write_degraded_responses_sheet(wb, sheet_name, issues):
+    """Write one mentor's degraded responses as a sheet of a write-only workbook"""
+    ws = wb.create_sheet(sheet_name)
+    
+    # Column widths and row heights must be set before the rows are streamed out
+    for col_num, width in enumerate(DEGRADED_REPORT_WIDTHS, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
     ws.row_dimensions[1].height = 30
     
-    return ws
+    header_style = report_style(ws, font=REPORT_HEADER_FONT, fill=REPORT_HEADER_FILL, alignment=REPORT_HEADER_ALIGNMENT)
+    text_style = report_style(ws, alignment=REPORT_CELL_ALIGNMENT)
+    severity_styles = {
+        'HIGH': report_style(ws, alignment=REPORT_CELL_ALIGNMENT, fill=REPORT_HIGH_FILL),
+        'MEDIUM': report_style(ws, alignment=REPORT_CELL_ALIGNMENT, fill=REPORT_MEDIUM_FILL)
+    }
+    
+    ws.append([styled_cell(ws, header, header_style) for header in DEGRADED_REPORT_HEADERS])
+    
+    for row_num, issue in enumerate(issues, 2):
+        row_data = degraded_report_row(issue)
+        ws.row_dimensions[row_num].height = degraded_report_row_height(row_data)
+        
+        # Serial number stays unstyled, text columns wrap, severity is color coded
+        row_cells = [row_data[0]]
+        row_cells.extend(styled_cell(ws, value, text_style) for value in row_data[1:-1])
+        row_cells.append(styled_cell(ws, row_data[-1], severity_styles['HIGH' if issue['severity'] == 'HIGH' else 'MEDIUM']))
+        ws.append(row_cells)
+    
+    return ws
+
+def save_degraded_responses_report(degraded_responses, output_file):
+    """Render the degraded responses report, one sheet per mentor, in a single streaming pass"""
+    wb = openpyxl.Workbook(write_only=True)
+    
+    # Group by sheet
+    sheets_with_issues = {}
+    for deg in degraded_responses:
+        sheets_with_issues.setdefault(deg['sheet_name'], []).append(deg)
+    
+    for sheet_name, issues in sheets_with_issues.items():
+        write_degraded_responses_sheet(wb, sheet_name, issues)
+    
+    wb.save(output_file)
+
+def output_source_file():
+    """The workbook new results are written over: the previous results, or the benchmark"""
+    return NEW_OUTPUT_FILE if os.path.exists(NEW_OUTPUT_FILE) else BENCHMARK_FILE
+
+def load_output_workbook():
+    """Load the previous results workbook, or start from a copy of the benchmark"""
+    return openpyxl.load_workbook(output_source_file())
+
+def measured_latency(result):
+    """Seconds the API took for a successful answer, None for errors and cached answers"""
+    if result['status'] != 'success' or result.get('cached'):
+        return None
+    return result.get('latency')
+
+def result_cell_values(result):
+    """(output, sources, latency) cell values for an API result"""
+    latency = measured_latency(result)
+    latency = round(latency, 2) if latency is not None else None
+    if result['status'] == 'success':
+        return result['response'], "\n".join(result['sources']) if result['sources'] else "", latency
+    return result['response'], "", latency
+
+def latency_column_index(header):
+    """0-based column of LATENCY_COLUMN_HEADER in a header row, or the one after the last filled header"""
+    header = list(header or ())
+    if LATENCY_COLUMN_HEADER in header:
+        return header.index(LATENCY_COLUMN_HEADER)
+    filled = [idx for idx, value in enumerate(header) if value not in (None, '')]
+    return max(4, filled[-1] + 1 if filled else 0)
+
+# Latency sheet layout: (header, latency_summary key, number format)
+LATENCY_SHEET_COLUMNS = [
+    ("Agent", None, None),
+    ("Calls", 'calls', '0'),
+    ("Total p50 (s)", 'total_p50', '0.000'),
+    ("Total p90 (s)", 'total_p90', '0.000'),
+    ("Total p99 (s)", 'total_p99', '0.000'),
+    ("TTFB p50 (s)", 'ttfb_p50', '0.000'),
+    ("TTFB p90 (s)", 'ttfb_p90', '0.000'),
+    ("TTFB p99 (s)", 'ttfb_p99', '0.000'),
+    ("New Connections", 'new_connections', '0'),
+    ("DNS Mean (s)", 'dns_mean', '0.000'),
+    ("Connect Mean (s)", 'connect_mean', '0.000'),
+    ("TLS Mean (s)", 'tls_mean', '0.000'),
+    ("Body p50 (bytes)", 'bytes_p50', '#,##0'),
+    ("Body Total (bytes)", 'bytes_total', '#,##0'),
+]
+
+def latency_sheet_rows(summary):
+    """Header plus one row per agent of a latency_summary(), rounded to milliseconds"""
+    rows = [[header for header, _, _ in LATENCY_SHEET_COLUMNS]]
+    for agent_id, metrics in summary.items():
+        values = [agent_id]
+        for _, key, _ in LATENCY_SHEET_COLUMNS[1:]:
+            value = metrics.get(key)
+            values.append(round(value, 3) if isinstance(value, float) else value)
+        rows.append(values)
+    return rows
+
+def write_latency_sheet(wb, summary):
+    """Replace the LATENCY_SHEET_NAME sheet of an in-place results workbook with this run's metrics"""
+    if LATENCY_SHEET_NAME in wb.sheetnames:
+        del wb[LATENCY_SHEET_NAME]
+    ws = wb.create_sheet(LATENCY_SHEET_NAME)
+    for values in latency_sheet_rows(summary):
+        ws.append(values)
+    
+    for col_idx, (header, _, number_format) in enumerate(LATENCY_SHEET_COLUMNS, 1):
+        ws.cell(row=1, column=col_idx).font = Font(bold=True)
+        ws.column_dimensions[get_column_letter(col_idx)].width = max(12, len(header) + 2)
+        if number_format:
+            for row in ws.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx):
+                row[0].number_format = number_format
+
+class StreamingOutputWriter:
+    """
+    Writes the results workbook in one streaming pass (OUTPUT_WRITE_MODE = 'streaming').
+    The source workbook is read in read-only mode and every sheet is re-emitted through an
+    openpyxl write-only worksheet, so memory stays flat as the number of prompts grows.
+    Prompt sheets get their output/sources columns filled as results complete; a per-sheet
+    reorder buffer holds early results until all rows above them are written.
+    Only cell values are copied - charts and formatting of the source are not kept.
+    """
+    
+    def __init__(self, source_file, output_file):
+        self.output_file = output_file
+        self.source = openpyxl.load_workbook(source_file, read_only=True)
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.worksheets = [self.workbook.create_sheet(title) for title in self.source.sheetnames]
+        self.sheets = {}
+        self.replaced = {}
+        self.lock = threading.Lock()
+    
+    def _source_rows(self, sheet_number):
+        ws = self.source[self.source.sheetnames[sheet_number - 1]]
+        # Don't trust the stored sheet dimensions, read every row that is actually there
+        ws.reset_dimensions()
+        return ws.iter_rows(values_only=True)
+    
+    def prompt_rows(self, sheet_number):
+        """[(row_idx, prompt)] for the data rows of a sheet, row_idx counting from 1 below the header"""
+        with self.lock:
+            rows = self._source_rows(sheet_number)
+            next(rows, None)
+            return [(row_idx, row[1] if len(row) > 1 else None) for row_idx, row in enumerate(rows, 1)]
+    
+    def begin_sheet(self, sheet_number, row_indices):
+        """Start streaming a sheet; rows in row_indices wait for write_result, all others are copied"""
+        with self.lock:
+            rows = self._source_rows(sheet_number)
+            header = next(rows, None)
+            latency_idx = None
+            if ENABLE_LATENCY_METRICS:
+                latency_idx = latency_column_index(header)
+                header = list(header or ())
+                header.extend([None] * (latency_idx + 1 - len(header)))
+                header[latency_idx] = LATENCY_COLUMN_HEADER
+            if header is not None:
+                self.worksheets[sheet_number - 1].append(header)
+            self.sheets[sheet_number] = {
+                'rows': enumerate(rows, 1),
+                'waiting': set(row_indices),
+                'ready': {},
+                'head': None,
+                'latency_idx': latency_idx
+            }
+    
+    def write_result(self, sheet_number, row_idx, output_value, sources_value, latency_value=None):
+        """Buffer one row's output/sources/latency and write every row that is now complete"""
+        with self.lock:
+            self.sheets[sheet_number]['ready'][row_idx] = (output_value, sources_value, latency_value)
+            self._flush(sheet_number)
+    
+    def replace_sheet(self, title, rows):
+        """Write rows as sheet title instead of copying it from the source (added at the end if new)"""
+        with self.lock:
+            self.replaced[title] = rows
+    
+    def _flush(self, sheet_number, drain=False):
+        state = self.sheets[sheet_number]
+        ws = self.worksheets[sheet_number - 1]
+        while True:
+            if state['head'] is None:
+                state['head'] = next(state['rows'], None)
+                if state['head'] is None:
+                    return
+            
+            row_idx, values = state['head']
+            if row_idx in state['waiting'] and row_idx not in state['ready'] and not drain:
+                return
+            
+            values = list(values)
+            if row_idx in state['ready']:
+                latency_idx = state['latency_idx']
+                values.extend([None] * (max(4, (latency_idx or 0) + 1) - len(values)))
+                values[2], values[3], latency_value = state['ready'].pop(row_idx)
+                if latency_idx is not None:
+                    values[latency_idx] = latency_value
+            ws.append(values)
+            state['head'] = None
+    
+    def close(self):
+        """Copy all remaining rows and sheets, then save the workbook once (atomically)"""
+        with self.lock:
+            for sheet_number, ws in enumerate(self.worksheets, 1):
+                if ws.title in self.replaced:
+                    for values in self.replaced.pop(ws.title):
+                        ws.append(values)
+                elif sheet_number in self.sheets:
+                    # Rows that never got a result keep their previous values
+                    self._flush(sheet_number, drain=True)
+                else:
+                    for values in self._source_rows(sheet_number):
+                        ws.append(values)
+            for title, rows in self.replaced.items():
+                ws = self.workbook.create_sheet(title)
+                for values in rows:
+                    ws.append(values)
+            self.source.close()
+            
+            temp_file = f"{self.output_file}.tmp"
+            self.workbook.save(temp_file)
+            os.replace(temp_file, self.output_file)
+
+def find_latency_degradations(sheet_number, config, jobs, results, benchmark_data):
+    """
+    Degraded entries for answers that got much slower than their baseline (is_latency_degraded),
+    plus one for the agent when its p90 latency regressed (is_agent_latency_degraded).
+    Baselines come from the results store history and the benchmark latency column (latency_baseline).
+    """
+    results_store = get_results_store()
+    history = results_store.latency_history(sheet_number) if results_store is not None else {}
+    
+    findings = []
+    latencies = []
+    baseline_latencies = []
+    for row_idx, prompt in jobs:
+        result = results[row_idx]
+        benchmark = benchmark_data.get(row_idx, {})
+        baseline = latency_baseline(history.get(row_idx, []), benchmark.get('latency'))
+        baseline_latencies.extend(baseline)
+        
+        latency = measured_latency(result)
+        if latency is None:
+            continue
+        latencies.append((latency, row_idx, prompt))
+        
+        is_degraded, reason, severity = is_latency_degraded(latency, baseline)
+        if is_degraded:
+            findings.append({
+                'serial': row_idx,
+                'prompt': str(prompt),
+                'old_response': benchmark.get('response', ''),
+                'new_response': result['response'],
+                'old_sources': benchmark.get('sources', ''),
+                'new_sources': "\n".join(result['sources']) if result['sources'] else "",
+                'reason': reason,
+                'severity': severity,
+                'sheet_name': config['name'],
+                'old_quality': benchmark.get('quality', 'unknown'),
+                'old_quality_mark': benchmark.get('quality_mark', '')
+            })
+    
+    is_degraded, reason, severity = is_agent_latency_degraded([latency for latency, _, _ in latencies],
+                                                              baseline_latencies)
+    if is_degraded:
+        slowest, slowest_row, slowest_prompt = max(latencies, key=lambda item: item[0])
+        findings.insert(0, {
+            'serial': slowest_row,
+            'prompt': f"{len(latencies)} prompts timed, slowest {slowest:.1f}s (row {slowest_row}): {slowest_prompt}",
+            'old_response': "",
+            'new_response': "",
+            'old_sources': "",
+            'new_sources': "",
+            'reason': reason,
+            'severity': severity,
+            'sheet_name': config['name'],
+            'old_quality': "unknown",
+            'old_quality_mark': "",
+            'agent_level': True
+        })
+    
+    return findings
 
-def process_sheet_with_comparison(sheet_number, config):
-    """Process sheet, compare with benchmark, identify degraded responses"""
+def process_sheet_with_comparison(sheet_number, config, wb_new=None, checkpoint=None, benchmark_data=None,
+                                  benchmark_vectors=None, output_writer=None):
+    """
+    Process sheet, compare with benchmark, identify degraded responses.
+    When wb_new is given, only its worksheet is updated and the caller saves the workbook.
+    When checkpoint is given, prompts it already holds are skipped and new results are journaled.
+    benchmark_data is this sheet's entry of load_benchmark_index(); it is loaded if not given.
+    benchmark_vectors is this sheet's entry of load_benchmark_vectors(); without it check 6 uses word overlap.
+    When output_writer (StreamingOutputWriter) is given, results are streamed to it instead of wb_new.
+    """
     
     print(f"\n{'='*70}")
     print(f"📊 Processing Sheet {sheet_number}: {config['name']}")
     print(f"{'='*70}")
     
     # Load benchmark data
-    benchmark_data = load_benchmark_data(sheet_number)
+    if benchmark_data is None:
+        benchmark_data = load_benchmark_data(sheet_number)
     
-    # Load or create new workbook
-    if os.path.exists(NEW_OUTPUT_FILE):
-        wb_new = openpyxl.load_workbook(NEW_OUTPUT_FILE)
-    else:
-        wb_new = openpyxl.load_workbook(BENCHMARK_FILE)
+    # Load or create new workbook, unless results are streamed to output_writer
+    save_workbook = wb_new is None and output_writer is None
+    if save_workbook:
+        with profile_stage('workbook load'):
+            wb_new = load_output_workbook()
     
-    sheetnames = wb_new.sheetnames
-    if sheet_number < 1 or sheet_number > len(sheetnames):
+    sheet_count = len(output_writer.worksheets) if output_writer is not None else len(wb_new.sheetnames)
+    if sheet_number < 1 or sheet_number > sheet_count:
         print(f"  ❌ Invalid sheet number")
         return [], 0, 0
     
-    ws_new = wb_new[sheetnames[sheet_number - 1]]
+    if output_writer is not None:
+        cells = None
+        source_rows = output_writer.prompt_rows(sheet_number)
+    else:
+        ws_new = wb_new[wb_new.sheetnames[sheet_number - 1]]
+        cells = dict(enumerate(ws_new.iter_rows(min_row=2), 1))
+        source_rows = [(row_idx, row[1].value) for row_idx, row in cells.items()]
+        latency_idx = None
+        if ENABLE_LATENCY_METRICS:
+            latency_idx = latency_column_index(next(ws_new.iter_rows(max_row=1, values_only=True), ()))
+            ws_new.cell(row=1, column=latency_idx + 1, value=LATENCY_COLUMN_HEADER)
     
     # API configuration
     api_url = f"{API_BASE_URL}{config['api_path']}"
@@ -484,22 +2658,103 @@ def process_sheet_with_comparison(sheet_number, config):
     else:
         print(f"⚠️  TEST MODE: First {TEST_LIMIT} rows only")
     
-    processed = 0
-    successful = 0
-    degraded_responses = []
-    
-    for row_idx, row in enumerate(ws_new.iter_rows(min_row=2), 1):
-        if TEST_LIMIT is not None and processed >= TEST_LIMIT:
+    # Collect prompts first so they can be fanned out to the API
+    jobs = []
+    for row_idx, prompt in source_rows:
+        if TEST_LIMIT is not None and len(jobs) >= TEST_LIMIT:
             break
         
-        prompt_cell = row[1]
-        output_cell = row[2]
-        sources_cell = row[3]
-        
-        prompt = prompt_cell.value
         if not prompt or not str(prompt).strip():
             continue
         
+        jobs.append((row_idx, prompt))
+    
+    prompt_jobs = [(row_idx, str(prompt)) for row_idx, prompt in jobs]
+    prompts = dict(prompt_jobs)
+    results = {}
+    
+    early_warning = ENABLE_EARLY_WARNING and ENABLE_TEAMS_ALERTS and bool(TEAMS_WEBHOOK_URL)
+    notifications = get_notification_queue()
+    
+    def on_result(row_idx, result):
+        """Journal and stream each result as soon as it arrives, and hand it to early warning"""
+        if checkpoint is not None:
+            checkpoint.record(agent_id, row_idx, prompts[row_idx], result)
+        if output_writer is not None:
+            output_writer.write_result(sheet_number, row_idx, *result_cell_values(result))
+        if early_warning:
+            notifications.publish('result_received', agent_id=agent_id, sheet_name=config['name'], row_idx=row_idx,
+                                  prompt=prompts[row_idx], result=result, benchmark=benchmark_data.get(row_idx, {}),
+                                  benchmark_vectors=benchmark_vectors)
+    
+    # Resume: reuse results journaled by an interrupted run, journal new ones as they arrive
+    if checkpoint is not None:
+        for row_idx, prompt in prompt_jobs:
+            done = checkpoint.get(agent_id, row_idx, prompt)
+            if done is not None:
+                results[row_idx] = done
+        if results:
+            print(f"♻️  Checkpoint: {len(results)} of {len(prompt_jobs)} prompts already done")
+    
+    # Reuse cached answers for this backend version, only ask the API on misses
+    cache = get_response_cache()
+    if cache is not None and RESPONSE_CACHE_MODE == 'changed-backend-only':
+        hits = 0
+        for row_idx, prompt in prompt_jobs:
+            if row_idx in results:
+                continue
+            cached = cache.get(agent_id, prompt)
+            if cached is not None:
+                results[row_idx] = cached
+                hits += 1
+        print(f"💾 Cache: {hits} of {len(prompt_jobs)} prompts answered from cache")
+    pending_jobs = [(row_idx, prompt) for row_idx, prompt in prompt_jobs if row_idx not in results]
+    
+    if output_writer is not None:
+        output_writer.begin_sheet(sheet_number, prompts)
+        for row_idx, result in results.items():
+            output_writer.write_result(sheet_number, row_idx, *result_cell_values(result))
+    
+    # Send to API
+    if ENABLE_ASYNC_CLIENT and httpx is not None:
+        print(f"🧵 Async client: up to {ASYNC_MAX_IN_FLIGHT} in flight ({len(pending_jobs)} prompts)")
+        results.update(run_prompts_async(pending_jobs, api_url, agent_id, on_result=on_result))
+    else:
+        if ENABLE_ASYNC_CLIENT:
+            print(f"  ⚠️  httpx not installed, falling back to worker threads")
+        max_workers = config.get('max_workers', DEFAULT_MAX_WORKERS) if ENABLE_CONCURRENT_EXECUTION else 1
+        print(f"🧵 Workers: {max_workers} ({len(pending_jobs)} prompts)")
+        results.update(run_prompts_concurrently(pending_jobs, api_url, agent_id, max_workers, on_result))
+    
+    if cache is not None:
+        for row_idx, prompt in pending_jobs:
+            cache.put(agent_id, prompt, results[row_idx])
+    
+    processed = 0
+    successful = 0
+    degraded_responses = []
+    short_circuited = []
+    
+    # Score every successful response against its benchmark in one batch
+    scored_rows = [row_idx for row_idx, prompt in jobs if results[row_idx]['status'] == 'success']
+    similarities = None
+    with profile_stage('compare'):
+        if benchmark_vectors is not None:
+            similarities = score_similarity_batch(
+                benchmark_vectors, scored_rows, [results[row_idx]['response'] for row_idx in scored_rows]
+            )
+        verdicts = dict(zip(scored_rows, score_responses_batch([
+            (
+                benchmark_data.get(row_idx, {}).get('response', ''),
+                results[row_idx]['response'],
+                prompts[row_idx],
+                benchmark_data.get(row_idx, {}).get('quality', 'unknown')
+            )
+            for row_idx in scored_rows
+        ], similarities)))
+    
+    # Write results back in row order so the output and degraded list are deterministic
+    for row_idx, prompt in jobs:
         processed += 1
         if TEST_LIMIT is None:
             print(f"\n[{processed}] Row {row_idx}:")
@@ -516,21 +2771,25 @@ def process_sheet_with_comparison(sheet_number, config):
         if old_quality_mark:
             print(f"     📊 Benchmark quality: {old_quality.upper()} ({old_quality_mark})")
         
-        # Send to API
-        result = send_question_to_api(str(prompt), api_url, agent_id)
+        result = results[row_idx]
+        if cells is not None:
+            cells[row_idx][2].value, cells[row_idx][3].value, latency_value = result_cell_values(result)
+            if latency_idx is not None:
+                ws_new.cell(row=row_idx + 1, column=latency_idx + 1, value=latency_value)
         
         if result['status'] == 'success':
             new_response = result['response']
             new_sources = "\n".join(result['sources']) if result['sources'] else ""
-            
-            output_cell.value = new_response
-            sources_cell.value = new_sources
             successful += 1
             
-            print(f"  ✅ Success: {len(new_response)} chars")
+            print(f"  ✅ Success: {len(new_response)} chars{' (cached)' if result.get('cached') else ''}")
+            if result.get('timing'):
+                print(f"  ⏱️  {format_timing(result['timing'])}")
             
             # Compare with benchmark
-            is_degraded, reason, severity = is_response_degraded(old_response, new_response, str(prompt), old_quality)
+            if old_response and new_response and old_quality == "bad":
+                print(f"    ℹ️  Old response was marked BAD - any new response is potential improvement")
+            is_degraded, reason, severity = verdicts[row_idx]
             
             if is_degraded:
                 print(f"  ⚠️  DEGRADATION DETECTED: {reason} (Severity: {severity})")
@@ -551,12 +2810,14 @@ def process_sheet_with_comparison(sheet_number, config):
             else:
                 print(f"  ✓ Quality maintained or improved")
         else:
-            output_cell.value = result['response']
-            sources_cell.value = ""
             print(f"  ❌ Error: {result['response']}")
             
+            # Prompts skipped by the circuit breaker are reported once for the whole sheet
+            if result.get('short_circuited'):
+                short_circuited.append((row_idx, prompt))
+            
             # If old response was good, this is a degradation
-            if old_response and 'error' not in old_response.lower() and old_quality != 'bad':
+            elif old_response and 'error' not in old_response.lower() and old_quality != 'bad':
                 severity = "HIGH" if old_quality == "good" else "MEDIUM"
                 degraded_responses.append({
                     'serial': row_idx,
@@ -572,15 +2833,307 @@ def process_sheet_with_comparison(sheet_number, config):
                     'old_quality_mark': old_quality_mark
                 })
     
+    # Answers (and the agent as a whole) that got much slower than their baseline
+    if ENABLE_LATENCY_DEGRADATION:
+        with profile_stage('compare'):
+            latency_findings = find_latency_degradations(sheet_number, config, jobs, results, benchmark_data)
+        if latency_findings:
+            print(f"\n  🐢 Latency regressions: {len(latency_findings)}")
+            for entry in latency_findings:
+                print(f"     Row {entry['serial']}: {entry['reason']} (Severity: {entry['severity']})")
+        degraded_responses.extend(latency_findings)
+    
+    if short_circuited:
+        first_row, first_prompt = short_circuited[0]
+        print(f"\n  🔌 Agent unavailable: {len(short_circuited)} prompts left unanswered (circuit breaker open)")
+        degraded_responses.insert(0, {
+            'serial': first_row,
+            'prompt': f"{len(short_circuited)} prompts unanswered (rows {first_row}-{short_circuited[-1][0]}), "
+                      f"first: {first_prompt}",
+            'old_response': "",
+            'new_response': circuit_open_result()['response'],
+            'old_sources': "",
+            'new_sources': "",
+            'reason': f"Agent unavailable: circuit breaker opened after {CIRCUIT_BREAKER_THRESHOLD} consecutive failed prompts",
+            'severity': "HIGH",
+            'sheet_name': config['name'],
+            'old_quality': "unknown",
+            'old_quality_mark': "",
+            'agent_level': True
+        })
+    
+    # Keep every row of this run for trend queries
+    results_store = get_results_store()
+    if results_store is not None:
+        # A row's first finding wins: content, then latency. Agent-wide findings (unavailable agent,
+        # p90 latency) are not the verdict of any one row and are stored separately
+        degraded_by_serial = {}
+        agent_findings = []
+        for entry in degraded_responses:
+            if entry.get('agent_level'):
+                agent_findings.append(entry)
+            else:
+                degraded_by_serial.setdefault(entry['serial'], entry)
+        similarity_by_serial = dict(zip(scored_rows, similarities)) if similarities is not None else {}
+        with profile_stage('results store'):
+            results_store.record_sheet(sheet_number, config['name'], agent_id, [
+            {
+                'serial': row_idx,
+                'prompt': prompts[row_idx],
+                'benchmark': benchmark_data.get(row_idx, {}),
+                'result': results[row_idx],
+                'degraded': degraded_by_serial.get(row_idx),
+                'similarity': similarity_by_serial.get(row_idx)
+            }
+            for row_idx, prompt in jobs
+        ], agent_findings)
+    
+    # Tell the notification workers, so HIGH findings reach Teams before the other sheets finish
+    notifications.publish('sheet_complete', sheet_name=config['name'], agent_id=agent_id, processed=processed,
+                          successful=successful, degraded=degraded_responses)
+    
     # Save new results
-    wb_new.save(NEW_OUTPUT_FILE)
-    print(f"\n  💾 New responses saved to {NEW_OUTPUT_FILE}")
+    if save_workbook:
+        with profile_stage('workbook save'):
+            wb_new.save(NEW_OUTPUT_FILE)
+        print(f"\n  💾 New responses saved to {NEW_OUTPUT_FILE}")
     
     return degraded_responses, processed, successful
 
+def run_all_sheets(wb_new, checkpoint=None, benchmark_index=None, benchmark_vectors=None, output_writer=None):
+    """
+    Run every sheet in SHEET_CONFIGS, concurrently when ENABLE_PARALLEL_SHEETS is set,
+    otherwise one after another on the calling thread.
+    Each sheet keeps its own worker budget and only touches its own worksheet in wb_new.
+    benchmark_index (from load_benchmark_index) and benchmark_vectors (from load_benchmark_vectors)
+    are shared read-only by all sheet workers. With output_writer, results stream to it instead of wb_new.
+    Returns [(degraded, processed, successful)] in SHEET_CONFIGS order.
+    """
+    if benchmark_index is None:
+        benchmark_index = load_benchmark_index(list(SHEET_CONFIGS))
+    
+    def run_sheet(sheet_number, config):
+        try:
+            return process_sheet_with_comparison(
+                sheet_number, config, wb_new, checkpoint, benchmark_index.get(sheet_number, {}),
+                (benchmark_vectors or {}).get(sheet_number), output_writer
+            )
+        except Exception as e:
+            print(f"\n  ❌ Error processing sheet {sheet_number}: {e}")
+            return [], 0, 0
+    
+    if not ENABLE_PARALLEL_SHEETS:
+        # One sheet at a time on the calling thread (profilers only see that thread)
+        return [run_sheet(sheet_number, config) for sheet_number, config in SHEET_CONFIGS.items()]
+    
+    with ThreadPoolExecutor(max_workers=max(1, len(SHEET_CONFIGS))) as executor:
+        futures = [executor.submit(run_sheet, sheet_number, config) for sheet_number, config in SHEET_CONFIGS.items()]
+        return [future.result() for future in futures]
+
 # ===== SHAREPOINT UPLOAD FUNCTION =====
+class Base64JsonBody:
+    """
+    File-like request body: a JSON object whose content_field holds (a slice of) a file, base64-encoded
+    while requests reads it. Only one block is held in memory at a time, and the length is known up front,
+    so the request is sent with a Content-Length. The bytes sent are hashed into sha256 as they go.
+    A body can be sent once; build a new one to retry.
+    """
+    
+    READ_SIZE = 3 * 64 * 1024  # Multiple of 3, so blocks encode without padding
+    
+    def __init__(self, path, fields, content_field='fileContent', offset=0, length=None):
+        self.path = path
+        self.offset = offset
+        self.length = os.path.getsize(path) - offset if length is None else length
+        self.sha256 = hashlib.sha256()
+        
+        prefix = json.dumps(fields)[:-1] + (", " if fields else "") + json.dumps(content_field) + ': "'
+        self._prefix = prefix.encode('utf-8')
+        self._suffix = b'"}'
+        self._size = len(self._prefix) + 4 * -(-self.length // 3) + len(self._suffix)
+        self._pieces = None
+        self._buffer = bytearray()
+    
+    def __len__(self):
+        return self._size
+    
+    def _iter_pieces(self):
+        yield self._prefix
+        remaining = self.length
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            while remaining > 0:
+                block = f.read(min(self.READ_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                self.sha256.update(block)
+                yield base64.b64encode(block)
+        if remaining:
+            raise IOError(f"{self.path} shrank by {remaining} bytes during the upload")
+        yield self._suffix
+    
+    def read(self, size=-1):
+        if self._pieces is None:
+            self._pieces = self._iter_pieces()
+        while size < 0 or len(self._buffer) < size:
+            piece = next(self._pieces, None)
+            if piece is None:
+                break
+            self._buffer += piece
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+def post_upload_body(body):
+    """POST one upload body to the flow; returns (response, None) or (None, error result for should-retry checks)"""
+    try:
+        response = get_http_session().post(
+            SHAREPOINT_UPLOAD_URL,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            # Read timeout is per socket operation, so large bodies are not cut off while they are being sent
+            timeout=(10, SHAREPOINT_UPLOAD_TIMEOUT)
+        )
+    except requests.RequestException as e:
+        return None, {'status': 'error', 'response': f"Error: {str(e)[:100]}", 'retryable': True}
+    
+    if response.status_code == 200:
+        return response, None
+    return response, http_error_result(response.status_code, response.headers.get('Retry-After'))
+
+def upload_file_single(file_path, fields):
+    """Upload the whole file in one streamed request (fileContent), retrying failed posts; returns the response or None"""
+    for attempt in range(MAX_RETRIES + 1):
+        body = Base64JsonBody(file_path, fields)
+        print(f"  📦 Streaming {fields['fileSize']:,} bytes as {len(body):,} bytes of JSON")
+        response, error = post_upload_body(body)
+        if error is None:
+            break
+        if not error.get('retryable') or attempt >= MAX_RETRIES:
+            print(f"  ❌ Upload failed: {error['response']}")
+            if response is not None:
+                print(f"  Response: {response.text}")
+            return None
+        delay = retry_delay(attempt, error.get('retry_after'))
+        print(f"  🔁 Upload: {error['response']} - retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+        time.sleep(delay)
+    if body.sha256.hexdigest() != fields['fileSha256']:
+        print(f"  ❌ {os.path.basename(file_path)} changed during the upload (SHA-256 mismatch)")
+        return None
+    return response
+
+def upload_file_chunked(file_path, fields):
+    """
+    Upload the file as an upload session of SHAREPOINT_CHUNK_SIZE parts (chunkContent), in order.
+    Each part carries uploadId, chunkIndex, chunkCount and offset; a failed part is retried on its own
+    (MAX_RETRIES, jittered backoff). Returns the response to the last part, or None.
+    """
+    file_size = fields['fileSize']
+    chunk_count = max(1, -(-file_size // SHAREPOINT_CHUNK_SIZE))
+    upload_id = uuid.uuid4().hex
+    response = None
+    
+    for chunk_index in range(chunk_count):
+        offset = chunk_index * SHAREPOINT_CHUNK_SIZE
+        part_fields = {**fields, 'uploadId': upload_id, 'chunkIndex': chunk_index, 'chunkCount': chunk_count,
+                       'offset': offset}
+        for attempt in range(MAX_RETRIES + 1):
+            body = Base64JsonBody(file_path, part_fields, 'chunkContent', offset,
+                                  min(SHAREPOINT_CHUNK_SIZE, file_size - offset))
+            response, error = post_upload_body(body)
+            if error is None:
+                break
+            if not error.get('retryable') or attempt >= MAX_RETRIES:
+                print(f"  ❌ Part {chunk_index + 1}/{chunk_count} failed: {error['response']}")
+                return None
+            delay = retry_delay(attempt, error.get('retry_after'))
+            print(f"  🔁 Part {chunk_index + 1}/{chunk_count}: {error['response']} - retry {attempt + 1}/{MAX_RETRIES} "
+                  f"in {delay:.1f}s")
+            time.sleep(delay)
+        print(f"  📦 Part {chunk_index + 1}/{chunk_count} uploaded ({offset + body.length:,}/{file_size:,} bytes)")
+    
+    return response
+
+def build_upload_bundle(paths, bundle_file=UPLOAD_BUNDLE_FILE):
+    """
+    Zip the given run artifacts that exist into bundle_file, with a manifest (UPLOAD_BUNDLE_MANIFEST)
+    of their names, sizes and SHA-256. Files are streamed into the archive. Returns the bundle path.
+    """
+    manifest = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'backend_version': BACKEND_VERSION,
+        'files': []
+    }
+    
+    temp_file = f"{bundle_file}.tmp"
+    with zipfile.ZipFile(temp_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=UPLOAD_BUNDLE_COMPRESSLEVEL) as bundle:
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            bundle.write(path, os.path.basename(path))
+            manifest['files'].append({
+                'name': os.path.basename(path),
+                'size': os.path.getsize(path),
+                'sha256': file_sha256(path)
+            })
+        bundle.writestr(UPLOAD_BUNDLE_MANIFEST, json.dumps(manifest, indent=2))
+    os.replace(temp_file, bundle_file)
+    
+    total = sum(entry['size'] for entry in manifest['files'])
+    print(f"  🗜️  Bundle {bundle_file}: {len(manifest['files'])} files, "
+          f"{total:,} -> {os.path.getsize(bundle_file):,} bytes")
+    return bundle_file
+
+def verify_upload_bundle(bundle_file):
+    """
+    Check a bundle against its manifest: every listed file present with the listed size and SHA-256,
+    nothing unlisted. Returns (manifest, [problem]); no problems means the bundle is intact.
+    """
+    problems = []
+    with zipfile.ZipFile(bundle_file) as bundle:
+        try:
+            manifest = json.loads(bundle.read(UPLOAD_BUNDLE_MANIFEST))
+        except (KeyError, ValueError) as e:
+            return None, [f"Unreadable {UPLOAD_BUNDLE_MANIFEST}: {e}"]
+        
+        listed = {entry['name'] for entry in manifest.get('files', [])}
+        for name in bundle.namelist():
+            if name != UPLOAD_BUNDLE_MANIFEST and name not in listed:
+                problems.append(f"{name}: not in the manifest")
+        
+        for entry in manifest.get('files', []):
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with bundle.open(entry['name']) as member:
+                    for block in iter(lambda: member.read(1024 * 1024), b''):
+                        digest.update(block)
+                        size += len(block)
+            except KeyError:
+                problems.append(f"{entry['name']}: missing")
+                continue
+            except zipfile.BadZipFile as e:
+                problems.append(f"{entry['name']}: {e}")
+                continue
+            if size != entry['size']:
+                problems.append(f"{entry['name']}: {size:,} bytes, manifest says {entry['size']:,}")
+            elif digest.hexdigest() != entry['sha256']:
+                problems.append(f"{entry['name']}: SHA-256 mismatch")
+    
+    return manifest, problems
+
 def upload_to_sharepoint(file_path):
-    """Upload Excel file to SharePoint via Power Automate and return the file URL"""
+    """
+    Upload Excel file to SharePoint via Power Automate and return the file URL.
+    The report is base64-encoded while it is sent (Base64JsonBody), so memory stays bounded by the block size.
+    SHAREPOINT_UPLOAD_MODE picks one streamed request ('single') or an upload session of parts ('chunked').
+    Every request carries fileSize and fileSha256; a fileSize returned by the flow must match.
+    """
     
     if not ENABLE_SHAREPOINT_UPLOAD:
         print("\n  ℹ️  SharePoint upload disabled (ENABLE_SHAREPOINT_UPLOAD = False)")
@@ -595,55 +3148,52 @@ def upload_to_sharepoint(file_path):
         return None
     
     try:
-        import base64
-        
         print(f"\n  📤 Uploading {os.path.basename(file_path)} to SharePoint...")
         
-        # Read and encode file
-        with open(file_path, 'rb') as f:
-            file_content = base64.b64encode(f.read()).decode('utf-8')
-        
-        # Prepare payload
+        # Prepare payload fields; the file content is streamed into the request body
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         filename = f"{timestamp}_{os.path.basename(file_path)}"
+        file_size = os.path.getsize(file_path)
         
-        payload = {
+        fields = {
             "filename": filename,
-            "fileContent": file_content,
-            "timestamp": timestamp
+            "timestamp": timestamp,
+            "fileSize": file_size,
+            "fileSha256": file_sha256(file_path)
         }
         
         # Send to Power Automate
-        response = requests.post(
-            SHAREPOINT_UPLOAD_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
+        if SHAREPOINT_UPLOAD_MODE == 'chunked':
+            response = upload_file_chunked(file_path, fields)
+        else:
+            response = upload_file_single(file_path, fields)
+        if response is None:
+            return None
         
-        if response.status_code == 200:
-            result = response.json()
-            file_path_relative = result.get('fileUrl', '')
+        result = response.json()
+        file_path_relative = result.get('fileUrl', '')
+        
+        # Verify the size the flow stored, when it reports one
+        stored_size = result.get('fileSize')
+        if stored_size is not None and int(stored_size) != file_size:
+            print(f"  ❌ Upload truncated: SharePoint stored {int(stored_size):,} of {file_size:,} bytes")
+            return None
+        
+        # Convert SharePoint path to full URL
+        if file_path_relative:
+            # Build full SharePoint URL - use proper encoding for spaces
+            site_url = "https://fortive.sharepoint.com/sites/FTV-TheFort"
+            # URL encode the path (spaces become %20)
+            encoded_path = urllib.parse.quote(file_path_relative)
+            # Build direct download/view link
+            full_url = f"{site_url}{encoded_path}"
             
-            # Convert SharePoint path to full URL
-            if file_path_relative:
-                # Build full SharePoint URL - use proper encoding for spaces
-                site_url = "https://fortive.sharepoint.com/sites/FTV-TheFort"
-                # URL encode the path (spaces become %20)
-                encoded_path = urllib.parse.quote(file_path_relative)
-                # Build direct download/view link
-                full_url = f"{site_url}{encoded_path}"
-                
-                print(f"  ✅ Uploaded successfully!")
-                print(f"  📁 File: {file_path_relative}")
-                print(f"  🔗 SharePoint URL: {full_url}")
-                return full_url
-            else:
-                print(f"  ⚠️  Upload succeeded but no file URL returned")
-                return None
+            print(f"  ✅ Uploaded successfully!")
+            print(f"  📁 File: {file_path_relative}")
+            print(f"  🔗 SharePoint URL: {full_url}")
+            return full_url
         else:
-            print(f"  ❌ Upload failed: HTTP {response.status_code}")
-            print(f"  Response: {response.text}")
+            print(f"  ⚠️  Upload succeeded but no file URL returned")
             return None
             
     except Exception as e:
@@ -651,8 +3201,13 @@ def upload_to_sharepoint(file_path):
         return None
 
 # ===== TEAMS ALERT FUNCTIONS =====
-def send_teams_alert(degraded_responses_summary, sharepoint_url=None):
-    """Send Microsoft Teams alert for degraded responses via Office 365 Incoming Webhook"""
+def send_teams_alert(degraded_responses_summary, sharepoint_url=None, latency=None):
+    """
+    Send Microsoft Teams alert for degraded responses via Office 365 Incoming Webhook.
+    latency (from latency_summary) adds one p50/p90/p99 fact per agent.
+    With ENABLE_ALERT_DEDUP only new or changed findings are listed; ongoing ones go into a digest,
+    and nothing is posted when there is nothing new and no digest is due (AlertState).
+    """
     
     if not ENABLE_TEAMS_ALERTS:
         print("\n  ℹ️  Teams alerts disabled (ENABLE_TEAMS_ALERTS = False)")
@@ -662,10 +3217,26 @@ def send_teams_alert(degraded_responses_summary, sharepoint_url=None):
         print("\n  ⚠️  Teams webhook URL not configured, skipping Teams alert")
         return
     
+    alert_state = get_alert_state()
+    
     if not degraded_responses_summary:
         print("\n  ✅ No degraded responses, no alert needed")
+        if alert_state is not None:
+            alert_state.record_run([], [])
         return
     
+    # Split into findings worth an alert and ongoing ones already alerted in earlier runs
+    if alert_state is not None:
+        new_findings, ongoing, resolved = alert_state.classify(degraded_responses_summary)
+        print(f"\n  🔎 Findings: {len(new_findings)} new or changed, {len(ongoing)} ongoing, "
+              f"{resolved} resolved since the last alert")
+        if not new_findings and not alert_state.digest_due():
+            print(f"  🔕 Nothing new and the last digest is under {ALERT_DIGEST_DAYS} days old - alert skipped")
+            alert_state.record_run(degraded_responses_summary, [])
+            return
+    else:
+        new_findings, ongoing, resolved = [(deg, None) for deg in degraded_responses_summary], [], 0
+    
     # Count by severity
     high_count = sum(1 for d in degraded_responses_summary if d['severity'] == 'HIGH')
     medium_count = sum(1 for d in degraded_responses_summary if d['severity'] == 'MEDIUM')
@@ -677,11 +3248,24 @@ def send_teams_alert(degraded_responses_summary, sharepoint_url=None):
         {"name": "Medium Severity Issues", "value": f"🟠 {medium_count}"},
         {"name": "Report File", "value": DEGRADED_OUTPUT_FILE}
     ]
+    if alert_state is not None:
+        facts.append({"name": "New or Changed", "value": f"🆕 {len(new_findings)}"})
+        facts.append({"name": "Ongoing (already alerted)", "value": f"🔁 {len(ongoing)}"})
+        facts.append({"name": "Resolved Since Last Alert", "value": f"✅ {resolved}"})
     
     # Add SharePoint link if available
     if sharepoint_url:
         facts.append({"name": "📁 SharePoint Report", "value": f"[Open Report]({sharepoint_url})"})
     
+    # Add latency percentiles per agent
+    for agent_id, metrics in (latency or {}).items():
+        ttfb = f", TTFB p50 {metrics['ttfb_p50']:.2f}s" if metrics['ttfb_p50'] is not None else ""
+        facts.append({
+            "name": f"⏱️ Latency ({agent_id})",
+            "value": f"p50 {metrics['total_p50']:.2f}s · p90 {metrics['total_p90']:.2f}s · "
+                     f"p99 {metrics['total_p99']:.2f}s ({metrics['calls']} calls{ttfb})"
+        })
+    
     # Build sections for MessageCard
     sections = [
         {
@@ -692,22 +3276,48 @@ def send_teams_alert(degraded_responses_summary, sharepoint_url=None):
         }
     ]
     
-    # Add top 5 issues as separate sections
-    for idx, deg in enumerate(degraded_responses_summary[:5], 1):
-        severity_emoji = "🔴" if deg['severity'] == 'HIGH' else "🟠"
-        sections.append({
-            "activityTitle": f"{severity_emoji} Issue #{idx}: {deg['sheet_name']} - Row {deg['serial']}",
-            "facts": [
-                {"name": "Prompt", "value": deg['prompt'][:100] + "..."},
-                {"name": "Reason", "value": deg['reason']},
-                {"name": "Severity", "value": deg['severity']}
-            ]
-        })
-    
-    if len(degraded_responses_summary) > 5:
-        sections.append({
-            "text": f"... and **{len(degraded_responses_summary) - 5} more issues**. Download the full report for details."
-        })
+    if alert_state is None:
+        # Add top 5 issues as separate sections
+        for idx, (deg, _) in enumerate(new_findings[:5], 1):
+            severity_emoji = "🔴" if deg['severity'] == 'HIGH' else "🟠"
+            sections.append({
+                "activityTitle": f"{severity_emoji} Issue #{idx}: {deg['sheet_name']} - Row {deg['serial']}",
+                "facts": [
+                    {"name": "Prompt", "value": deg['prompt'][:100] + "..."},
+                    {"name": "Reason", "value": deg['reason']},
+                    {"name": "Severity", "value": deg['severity']}
+                ]
+            })
+        
+        if len(degraded_responses_summary) > 5:
+            sections.append({
+                "text": f"... and **{len(degraded_responses_summary) - 5} more issues**. Download the full report for details."
+            })
+    else:
+        # New and changed findings one by one, everything else batched into the digest
+        for idx, (deg, previous_severity) in enumerate(new_findings[:ALERT_MAX_ISSUES], 1):
+            severity_emoji = "🔴" if deg['severity'] == 'HIGH' else "🟠"
+            status = f"🔺 Changed from {previous_severity}" if previous_severity else "🆕 New"
+            sections.append({
+                "activityTitle": f"{severity_emoji} {status}: {deg['sheet_name']} - Row {deg['serial']}",
+                "facts": [
+                    {"name": "Prompt", "value": deg['prompt'][:100] + "..."},
+                    {"name": "Reason", "value": deg['reason']},
+                    {"name": "Severity", "value": deg['severity']}
+                ]
+            })
+        
+        overflow = [deg for deg, _ in new_findings[ALERT_MAX_ISSUES:]]
+        if overflow:
+            sections.append({
+                "activityTitle": f"🆕 {len(overflow)} more new or changed findings",
+                "text": "\n\n".join(digest_lines(overflow))
+            })
+        if ongoing:
+            sections.append({
+                "activityTitle": f"📋 Digest: {len(ongoing)} ongoing findings (already alerted)",
+                "text": "\n\n".join(digest_lines(ongoing))
+            })
     
     # Office 365 MessageCard format
     message_card = {
@@ -732,28 +3342,467 @@ def send_teams_alert(degraded_responses_summary, sharepoint_url=None):
         ]
     }
     
-    try:
-        print(f"\n  📤 Attempting to send Teams alert...")
-        response = requests.post(TEAMS_WEBHOOK_URL, json=message_card, timeout=10)
+    print(f"\n  📤 Attempting to send Teams alert...")
+    posted = post_teams_card(message_card)
+    if posted:
+        print(f"  ✅ Teams webhook accepted the request")
+        print(f"  ℹ️  Note: Check your Power Automate run history if the card doesn't appear")
+        print(f"  ℹ️  URL: https://make.powerautomate.com/")
+    
+    # Findings of a failed post stay new, so the next run alerts them again
+    if alert_state is not None:
+        alert_state.record_run(degraded_responses_summary, [deg for deg, _ in new_findings] if posted else [],
+                               digest=posted)
+
+def post_teams_card(message_card):
+    """POST a MessageCard to the Teams webhook, retrying timeouts and throttled/server errors; returns True if accepted"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = get_http_session().post(TEAMS_WEBHOOK_URL, json=message_card, timeout=10)
+        except requests.exceptions.Timeout:
+            error = {'response': "Teams webhook timeout (10s)", 'retryable': True}
+        except requests.exceptions.RequestException as e:
+            error = {'response': f"Teams webhook request failed: {type(e).__name__}", 'retryable': True}
+        else:
+            print(f"  📡 Webhook response: HTTP {response.status_code}")
+            if response.status_code in [200, 202]:
+                return True
+            error = http_error_result(response.status_code, response.headers.get('Retry-After'))
+            if not error['retryable']:
+                print(f"  ⚠️  Unexpected status code: {response.status_code}")
+                print(f"  Response: {response.text[:200] if response.text else '(empty)'}")
+                return False
+        
+        if attempt >= MAX_RETRIES:
+            print(f"  ⚠️  {error['response']} - giving up after {attempt + 1} attempts")
+            print(f"  ℹ️  This won't stop the test - check webhook URL and Power Automate setup")
+            return False
+        delay = retry_delay(attempt, error.get('retry_after'))
+        print(f"  🔁 Teams post: {error['response']} - retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+        time.sleep(delay)
+
+# ===== ALERT DEDUPLICATION =====
+def reason_class(reason):
+    """A reason without its measured details, e.g. 'Response significantly shorter'"""
+    return re.split(r'[:(]', reason, 1)[0].strip()
+
+def sheet_agent_id(sheet_name):
+    """agent_id of the SHEET_CONFIGS entry named sheet_name (the name itself if there is none)"""
+    return next((config['agent_id'] for config in SHEET_CONFIGS.values() if config['name'] == sheet_name), sheet_name)
+
+def finding_fingerprint(agent_id, serial, reason):
+    """Key of a finding across runs: agent, serial and reason class"""
+    return f"{agent_id}|{serial}|{reason_class(reason)}"
+
+def entry_fingerprint(entry):
+    """
+    finding_fingerprint of a degraded entry. Agent-level findings point at whichever row was slowest
+    or unanswered first, so they are keyed by 'agent' instead of that row to stay stable across runs.
+    """
+    serial = 'agent' if entry.get('agent_level') else entry['serial']
+    return finding_fingerprint(sheet_agent_id(entry['sheet_name']), serial, entry['reason'])
+
+def digest_lines(entries):
+    """One markdown line per sheet with how many findings of each reason class it has"""
+    by_sheet = {}
+    for entry in entries:
+        counts = by_sheet.setdefault(entry['sheet_name'], {})
+        counts[reason_class(entry['reason'])] = counts.get(reason_class(entry['reason']), 0) + 1
+    return [
+        f"**{sheet_name}**: " + ", ".join(f"{count}× {cls}" for cls, count in
+                                          sorted(counts.items(), key=lambda item: -item[1]))
+        for sheet_name, counts in by_sheet.items()
+    ]
+
+class AlertState:
+    """
+    Findings seen and alerted in earlier runs, kept in ALERT_STATE_FILE (JSON) by entry_fingerprint.
+    A finding is new until an alert listing it was accepted, and changed when its severity differs
+    from the alerted one. Findings missing from a run are forgotten, so they alert again if they return.
+    """
+    
+    def __init__(self, path=ALERT_STATE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.findings = {}
+        self.last_digest = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                self.findings = state.get('findings', {})
+                self.last_digest = state.get('last_digest')
+            except (OSError, ValueError) as e:
+                print(f"  ⚠️  Alert state {path} unreadable ({e}), every finding counts as new")
+    
+    def is_alerted(self, fingerprint, severity):
+        """True if this finding was already alerted with this severity"""
+        with self.lock:
+            known = self.findings.get(fingerprint)
+            return known is not None and known.get('alerted_severity') == severity
+    
+    def classify(self, degraded):
+        """
+        Split a run's findings: ([(entry, previous alerted severity or None)] new or changed,
+        [entry] ongoing, number of alerted findings that are gone)
+        """
+        new_findings, ongoing, seen = [], [], set()
+        with self.lock:
+            for entry in degraded:
+                fingerprint = entry_fingerprint(entry)
+                seen.add(fingerprint)
+                alerted_severity = self.findings.get(fingerprint, {}).get('alerted_severity')
+                if alerted_severity == entry['severity']:
+                    ongoing.append(entry)
+                else:
+                    new_findings.append((entry, alerted_severity))
+            resolved = sum(1 for fingerprint, known in self.findings.items()
+                           if fingerprint not in seen and known.get('alerted_severity'))
+        return new_findings, ongoing, resolved
+    
+    def digest_due(self):
+        if self.last_digest is None:
+            return True
+        return (datetime.now() - datetime.fromisoformat(self.last_digest)).days >= ALERT_DIGEST_DAYS
+    
+    def record_run(self, degraded, alerted, digest=False):
+        """Replace the state with this run's findings, marking the alerted ones, and save it"""
+        now = datetime.now().isoformat(timespec='seconds')
+        alerted_fingerprints = {entry_fingerprint(entry) for entry in alerted}
+        with self.lock:
+            findings = {}
+            for entry in degraded:
+                fingerprint = entry_fingerprint(entry)
+                previous = self.findings.get(fingerprint, {})
+                findings[fingerprint] = {
+                    'severity': entry['severity'],
+                    'reason': entry['reason'],
+                    'first_seen': previous.get('first_seen', now),
+                    'last_seen': now,
+                    'alerted_severity': entry['severity'] if fingerprint in alerted_fingerprints
+                                        else previous.get('alerted_severity')
+                }
+            self.findings = findings
+            if digest:
+                self.last_digest = now
+            
+            temp_file = f"{self.path}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'last_digest': self.last_digest, 'findings': self.findings}, f, indent=2)
+            os.replace(temp_file, self.path)
+
+_alert_state = None
+_alert_state_lock = threading.Lock()
+
+def get_alert_state():
+    """Return the AlertState loaded for this run, or None when ENABLE_ALERT_DEDUP is off"""
+    global _alert_state
+    if not ENABLE_ALERT_DEDUP:
+        return None
+    with _alert_state_lock:
+        if _alert_state is None:
+            _alert_state = AlertState()
+        return _alert_state
+
+# ===== NOTIFICATIONS =====
+class NotificationQueue:
+    """
+    Run events handled off the critical path. Handlers subscribe to an event type; publish() queues
+    one call per handler and returns at once, and NOTIFY_WORKERS threads run them concurrently.
+    Retries live in the HTTP steps (post_teams_card, the upload functions). close() drains the queue.
+    Events: 'result_received', 'sheet_complete', 'run_complete'.
+    """
+    
+    def __init__(self, workers=NOTIFY_WORKERS):
+        self.handlers = {}
+        self.queue = queue.Queue()
+        self.threads = [threading.Thread(target=self._work, name=f"kata-notify-{i}", daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+    
+    def subscribe(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+    
+    def publish(self, event, **payload):
+        for handler in self.handlers.get(event, []):
+            if self.threads:
+                self.queue.put((handler, payload))
+            else:
+                self._handle(handler, payload)
+    
+    def _handle(self, handler, payload):
+        try:
+            handler(**payload)
+        except Exception as e:
+            # A failed notification never fails the run
+            print(f"  ⚠️  Notification {handler.__name__} failed: {e}")
+    
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self._handle(*item)
+    
+    def close(self):
+        """Handle every queued event, then stop the workers"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+_notification_queue = None
+_notification_queue_lock = threading.Lock()
+
+def get_notification_queue():
+    """Return the run's NotificationQueue with the default handlers, creating it on first use"""
+    global _notification_queue
+    with _notification_queue_lock:
+        if _notification_queue is None:
+            _notification_queue = NotificationQueue(NOTIFY_WORKERS if ENABLE_NOTIFICATION_QUEUE else 0)
+            _notification_queue.subscribe('result_received', EarlyWarningMonitor().on_result)
+            _notification_queue.subscribe('sheet_complete', notify_sheet_complete)
+            _notification_queue.subscribe('run_complete', notify_run_complete)
+        return _notification_queue
+
+def close_notification_queue():
+    """Wait for pending notifications (uploads, Teams posts) before the run exits"""
+    global _notification_queue
+    with _notification_queue_lock:
+        notifications, _notification_queue = _notification_queue, None
+    if notifications is not None:
+        if notifications.threads and not notifications.queue.empty():
+            print(f"\n  ⏳ Waiting for pending notifications...")
+        notifications.close()
+
+def build_sheet_card(sheet_name, processed, successful, high_findings):
+    """Compact MessageCard for a sheet that finished with HIGH severity findings"""
+    facts = [
+        {"name": "Prompts Processed", "value": str(processed)},
+        {"name": "Successful Calls", "value": str(successful)},
+        {"name": "High Severity Issues", "value": f"🔴 {len(high_findings)}"}
+    ]
+    for deg in high_findings[:NOTIFY_SHEET_CARD_ISSUES]:
+        facts.append({"name": f"Row {deg['serial']}", "value": deg['reason']})
+    if len(high_findings) > NOTIFY_SHEET_CARD_ISSUES:
+        facts.append({"name": "More", "value": f"... and {len(high_findings) - NOTIFY_SHEET_CARD_ISSUES} more, "
+                                               f"full report when the run finishes"})
+    
+    return {
+        "@type": "MessageCard",
+        "@context": "https://schema.org/extensions",
+        "summary": f"🔴 {sheet_name}: {len(high_findings)} High Severity Issues",
+        "themeColor": "FF0000",
+        "title": f"🔴 Early Warning: {sheet_name} finished with {len(high_findings)} High Severity Issues",
+        "sections": [{
+            "activitySubtitle": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "facts": facts,
+            "markdown": True
+        }]
+    }
+
+def notify_sheet_complete(sheet_name, agent_id, processed, successful, degraded):
+    """'sheet_complete' handler: post a compact card while the other sheets are still running"""
+    high_findings = [deg for deg in degraded if deg['severity'] == 'HIGH']
+    if not (NOTIFY_SHEET_CARDS and ENABLE_TEAMS_ALERTS and TEAMS_WEBHOOK_URL and high_findings):
+        return
+    if ENABLE_EARLY_WARNING:
+        # Early-warning cards already reported these while the sheet was running
+        return
+    with profile_stage('Teams post'):
+        if post_teams_card(build_sheet_card(sheet_name, processed, successful, high_findings)):
+            print(f"\n  📢 [{agent_id}] Early warning posted: {len(high_findings)} HIGH findings in {sheet_name}")
+
+def early_high_finding(row_idx, prompt, result, benchmark, benchmark_vectors=None):
+    """Reason if one result is a HIGH degradation by the same checks as the sheet's final pass, else None"""
+    if result.get('short_circuited'):
+        return None  # The final pass reports these as one agent-level "Agent unavailable" finding
+    old_response = benchmark.get('response', '')
+    old_quality = benchmark.get('quality', 'unknown')
+    if result['status'] != 'success':
+        if old_response and 'error' not in old_response.lower() and old_quality == 'good':
+            return "API call failed, old response was successful"
+        return None
+    
+    similarities = None
+    if benchmark_vectors is not None:
+        similarities = score_similarity_batch(benchmark_vectors, [row_idx], [result['response']])
+    is_degraded, reason, severity = score_responses_batch(
+        [(old_response, result['response'], prompt, old_quality)], similarities
+    )[0]
+    return reason if is_degraded and severity == 'HIGH' else None
+
+def build_early_warning_card(agent_id, sheet_name, trigger, scored, high_count, findings):
+    """Compact MessageCard for HIGH findings reported while a sheet is still running"""
+    facts = [
+        {"name": "Trigger", "value": trigger},
+        {"name": "High Severity So Far", "value": f"🔴 {high_count} of {scored} scored results"}
+    ]
+    for deg in findings[-NOTIFY_SHEET_CARD_ISSUES:]:
+        facts.append({"name": f"Row {deg['serial']}", "value": deg['reason']})
+    if len(findings) > NOTIFY_SHEET_CARD_ISSUES:
+        facts.append({"name": "More", "value": f"... and {len(findings) - NOTIFY_SHEET_CARD_ISSUES} more, "
+                                               f"full report when the run finishes"})
+    
+    return {
+        "@type": "MessageCard",
+        "@context": "https://schema.org/extensions",
+        "summary": f"🔴 {sheet_name}: {len(findings)} new High Severity Issues",
+        "themeColor": "FF0000",
+        "title": f"🔴 Early Warning: {sheet_name} ({agent_id}) is still running with {high_count} High Severity Issues",
+        "sections": [{
+            "activitySubtitle": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "facts": facts,
+            "markdown": True
+        }]
+    }
+
+class EarlyWarningMonitor:
+    """
+    'result_received' handler: scores each result as it arrives and posts a compact Teams card when an
+    agent's new HIGH findings reach EARLY_WARNING_HIGH_COUNT or its HIGH rate reaches EARLY_WARNING_HIGH_RATE.
+    Cards for one agent are at least EARLY_WARNING_DEBOUNCE seconds apart; findings held back go on the
+    next card, and the final alert lists them all. Findings alerted in earlier runs (AlertState) are skipped.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.agents = {}
+    
+    def on_result(self, agent_id, sheet_name, row_idx, prompt, result, benchmark, benchmark_vectors=None):
+        with profile_stage('compare'):
+            reason = early_high_finding(row_idx, prompt, result, benchmark, benchmark_vectors)
         
-        print(f"  📡 Webhook response: HTTP {response.status_code}")
+        # Findings already alerted in an earlier run do not trigger a card again
+        alert_state = get_alert_state()
+        if reason is not None and alert_state is not None:
+            if alert_state.is_alerted(finding_fingerprint(agent_id, row_idx, reason), 'HIGH'):
+                reason = None
         
-        if response.status_code in [200, 202]:
-            print(f"  ✅ Teams webhook accepted the request")
-            print(f"  ℹ️  Note: Check your Power Automate run history if the card doesn't appear")
-            print(f"  ℹ️  URL: https://make.powerautomate.com/")
-        else:
-            print(f"  ⚠️  Unexpected status code: {response.status_code}")
-            print(f"  Response: {response.text[:200] if response.text else '(empty)'}")
-    except requests.exceptions.Timeout:
-        print(f"  ⚠️  Teams webhook timeout (10s) - continuing anyway")
-    except requests.exceptions.RequestException as e:
-        print(f"  ⚠️  Teams webhook request failed: {type(e).__name__}")
-        print(f"  ℹ️  This won't stop the test - check webhook URL and Power Automate setup")
+        with self.lock:
+            state = self.agents.setdefault(agent_id, {'scored': 0, 'high': 0, 'pending': [], 'last_card': None})
+            state['scored'] += 1
+            if reason is None:
+                return
+            state['high'] += 1
+            state['pending'].append({'serial': row_idx, 'reason': reason})
+            trigger = self._trigger(state)
+            if trigger is None:
+                return
+            findings, state['pending'] = state['pending'], []
+            state['last_card'] = time.monotonic()
+            scored, high_count = state['scored'], state['high']
+        
+        print(f"\n  🚨 [{agent_id}] Early warning: {trigger}")
+        with profile_stage('Teams post'):
+            if post_teams_card(build_early_warning_card(agent_id, sheet_name, trigger, scored, high_count, findings)):
+                print(f"  📢 [{agent_id}] Early warning posted: {len(findings)} new HIGH findings in {sheet_name}")
+    
+    def _trigger(self, state):
+        """Why a card is due now, or None (debounced, or below both thresholds)"""
+        if state['last_card'] is not None and time.monotonic() - state['last_card'] < EARLY_WARNING_DEBOUNCE:
+            return None
+        if len(state['pending']) >= EARLY_WARNING_HIGH_COUNT:
+            return f"{len(state['pending'])} new HIGH findings"
+        rate = state['high'] / state['scored']
+        if EARLY_WARNING_HIGH_RATE and state['scored'] >= EARLY_WARNING_MIN_RESULTS and rate >= EARLY_WARNING_HIGH_RATE:
+            return f"{rate:.0%} of {state['scored']} scored results are HIGH"
+        return None
+
+def notify_run_complete(degraded, latency):
+    """'run_complete' handler: upload the report, then send the final Teams alert with its link"""
+    sharepoint_url = None
+    if degraded:
+        print(f"\n{'='*70}")
+        print(f"☁️  Uploading to SharePoint")
+        print(f"{'='*70}")
+        with profile_stage('SharePoint upload'):
+            if SHAREPOINT_UPLOAD_BUNDLE and ENABLE_SHAREPOINT_UPLOAD:
+                # One webhook call for every artifact of the run
+                sharepoint_url = upload_to_sharepoint(build_upload_bundle([DEGRADED_OUTPUT_FILE, NEW_OUTPUT_FILE]))
+            else:
+                sharepoint_url = upload_to_sharepoint(DEGRADED_OUTPUT_FILE)
+    
+    print(f"\n{'='*70}")
+    print(f"📢 Sending Teams Alert")
+    print(f"{'='*70}")
+    with profile_stage('Teams post'):
+        send_teams_alert(degraded, sharepoint_url, latency)
 
 # ===== MAIN FUNCTION =====
-def main():
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="KATA API testing and benchmark comparison")
+    parser.add_argument('--resume', nargs='?', const=True, default=False, choices=[True, 'auto'],
+                        help=f"Continue an interrupted run, skipping prompts already in {CHECKPOINT_FILE}; "
+                             f"'--resume auto' only resumes when that file exists (CI)")
+    parser.add_argument('--profile', nargs='?', const='stages', choices=['stages', 'cprofile', 'pyinstrument'],
+                        help=f"Time each pipeline stage and write the breakdown to {PROFILE_REPORT_FILE}; "
+                             f"'cprofile' or 'pyinstrument' also dump a full profile to {PROFILE_DUMP_FILE}.*")
+    return parser.parse_args(argv)
+
+def run_profiled(args):
+    """
+    Run the pipeline with stage timers (--profile) and print/save the stage breakdown.
+    With a cProfile or pyinstrument dump, sheets and prompts run one at a time on the main thread,
+    since both profilers only see the thread they were started in.
+    """
+    global _profiler, ENABLE_PARALLEL_SHEETS, ENABLE_CONCURRENT_EXECUTION
+    _profiler = StageProfiler()
+    
+    profiler = None
+    if args.profile == 'cprofile':
+        profiler = cProfile.Profile()
+    elif args.profile == 'pyinstrument':
+        if pyinstrument is None:
+            print("  ⚠️  pyinstrument not installed (pip install pyinstrument), timing stages only")
+        else:
+            profiler = pyinstrument.Profiler()
+    
+    parallel_sheets, concurrent_execution = ENABLE_PARALLEL_SHEETS, ENABLE_CONCURRENT_EXECUTION
+    if profiler is not None:
+        print(f"🔬 Profiling with {args.profile}: sheets and prompts run one at a time on the main thread")
+        ENABLE_PARALLEL_SHEETS = False
+        ENABLE_CONCURRENT_EXECUTION = False
+        if ENABLE_ASYNC_CLIENT:
+            print(f"  ⚠️  Async client requests run on their own event loop thread and are not in the profile")
+        if args.profile == 'cprofile':
+            profiler.enable()
+        else:
+            profiler.start()
+    
+    try:
+        run(args)
+    finally:
+        ENABLE_PARALLEL_SHEETS, ENABLE_CONCURRENT_EXECUTION = parallel_sheets, concurrent_execution
+        if args.profile == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(f"{PROFILE_DUMP_FILE}.prof")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+            print(f"  💾 cProfile dump saved: {PROFILE_DUMP_FILE}.prof")
+        elif profiler is not None:
+            profiler.stop()
+            with open(f"{PROFILE_DUMP_FILE}.html", 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+            print(f"  💾 pyinstrument report saved: {PROFILE_DUMP_FILE}.html")
+        
+        _profiler.print_report()
+        _profiler.save(PROFILE_REPORT_FILE)
+        print(f"  💾 Stage breakdown saved: {PROFILE_REPORT_FILE}")
+        _profiler = None
+
+def main(argv=None):
     """Main execution function"""
+    args = parse_args(argv)
+    if args.profile:
+        run_profiled(args)
+    else:
+        run(args)
+
+def run(args):
+    """Run the whole test: call every agent, compare, save the workbooks, report and alert"""
     print("="*70)
     print("🧪 INTEGRATED TEST: API Testing + Comparison + Teams Alerts")
     print("="*70)
@@ -771,16 +3820,40 @@ def main():
     total_processed = 0
     total_successful = 0
     
-    # Process each sheet
-    for sheet_number, config in SHEET_CONFIGS.items():
-        try:
-            degraded, processed, successful = process_sheet_with_comparison(sheet_number, config)
-            all_degraded_responses.extend(degraded)
-            total_processed += processed
-            total_successful += successful
-        except Exception as e:
-            print(f"\n  ❌ Error processing sheet {sheet_number}: {e}")
-            continue
+    # Process all sheets (in parallel), sharing one output workbook that is saved once
+    checkpoint = RunCheckpoint(CHECKPOINT_FILE, resume=args.resume)
+    with profile_stage('benchmark load'):
+        benchmark_index = load_benchmark_index(list(SHEET_CONFIGS))
+        benchmark_vectors = load_benchmark_vectors(benchmark_index)
+    with profile_stage('workbook load'):
+        if OUTPUT_WRITE_MODE == 'streaming':
+            wb_new = None
+            output_writer = StreamingOutputWriter(output_source_file(), NEW_OUTPUT_FILE)
+        else:
+            wb_new = load_output_workbook()
+            output_writer = None
+    for degraded, processed, successful in run_all_sheets(wb_new, checkpoint, benchmark_index, benchmark_vectors,
+                                                          output_writer):
+        all_degraded_responses.extend(degraded)
+        total_processed += processed
+        total_successful += successful
+    
+    # Per-agent latency percentiles go into their own sheet of the results workbook
+    latency = latency_summary()
+    if ENABLE_LATENCY_METRICS:
+        if output_writer is not None:
+            output_writer.replace_sheet(LATENCY_SHEET_NAME, latency_sheet_rows(latency))
+        else:
+            write_latency_sheet(wb_new, latency)
+    
+    with profile_stage('workbook save'):
+        if output_writer is not None:
+            output_writer.close()
+        else:
+            wb_new.save(NEW_OUTPUT_FILE)
+    print(f"\n  💾 New responses saved to {NEW_OUTPUT_FILE}")
+    close_response_cache()
+    close_results_store(total_processed, total_successful)
     
     # Create degraded responses report
     if all_degraded_responses:
@@ -788,66 +3861,8 @@ def main():
         print(f"📝 Creating Degraded Responses Report")
         print(f"{'='*70}")
         
-        wb_degraded = openpyxl.Workbook()
-        wb_degraded.remove(wb_degraded.active)  # Remove default sheet
-        
-        # Group by sheet
-        sheets_with_issues = {}
-        for deg in all_degraded_responses:
-            sheet_name = deg['sheet_name']
-            if sheet_name not in sheets_with_issues:
-                sheets_with_issues[sheet_name] = []
-            sheets_with_issues[sheet_name].append(deg)
-        
-        # Create a sheet for each mentor with issues
-        for sheet_name, issues in sheets_with_issues.items():
-            ws = create_degraded_responses_sheet(wb_degraded, sheet_name)
-            
-            for issue in issues:
-                quality_display = f"{issue.get('old_quality', 'unknown').upper()}"
-                if issue.get('old_quality_mark'):
-                    quality_display += f" ({issue['old_quality_mark']})"
-                
-                row_data = [
-                    issue['serial'],
-                    issue['prompt'],
-                    issue['old_response'],
-                    issue['new_response'],
-                    issue['old_sources'],
-                    issue['new_sources'],
-                    quality_display,
-                    issue['reason'],
-                    issue['severity']
-                ]
-                ws.append(row_data)
-                
-                # Set text wrapping and row height
-                current_row = ws.max_row
-                for col_num in range(2, 10):
-                    cell = ws.cell(row=current_row, column=col_num)
-                    cell.alignment = Alignment(wrap_text=True, vertical="top")
-                
-                # Auto-adjust row height based on content (estimate)
-                max_lines = 1
-                for col_num in [2, 3, 4, 8]:  # Prompt, Old Response, New Response, Reason
-                    cell = ws.cell(row=current_row, column=col_num)
-                    if cell.value:
-                        text_length = len(str(cell.value))
-                        col_width = ws.column_dimensions[cell.column_letter].width
-                        estimated_lines = max(1, text_length / col_width)
-                        max_lines = max(max_lines, estimated_lines)
-                
-                # Set minimum row height with some padding
-                ws.row_dimensions[current_row].height = max(30, min(max_lines * 15, 200))
-                
-                # Color code by severity
-                severity_cell = ws.cell(row=current_row, column=9)
-                if issue['severity'] == 'HIGH':
-                    severity_cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                else:
-                    severity_cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-        
-        wb_degraded.save(DEGRADED_OUTPUT_FILE)
+        with profile_stage('report build'):
+            save_degraded_responses_report(all_degraded_responses, DEGRADED_OUTPUT_FILE)
         print(f"  💾 Degraded responses report saved: {DEGRADED_OUTPUT_FILE}")
     else:
         # Create a minimal report even when there are no degraded responses so CI/artifact
@@ -864,19 +3879,14 @@ def main():
         wb_degraded.save(DEGRADED_OUTPUT_FILE)
         print(f"  💾 Empty degraded responses report saved: {DEGRADED_OUTPUT_FILE}")
     
-    # Upload to SharePoint
-    sharepoint_url = None
-    if all_degraded_responses:
-        print(f"\n{'='*70}")
-        print(f"☁️  Uploading to SharePoint")
-        print(f"{'='*70}")
-        sharepoint_url = upload_to_sharepoint(DEGRADED_OUTPUT_FILE)
+    # Upload and alert on the notification workers
+    get_notification_queue().publish('run_complete', degraded=all_degraded_responses, latency=latency)
     
-    # Send Teams alert
-    print(f"\n{'='*70}")
-    print(f"📢 Sending Teams Alert")
-    print(f"{'='*70}")
-    send_teams_alert(all_degraded_responses, sharepoint_url)
+    # Run finished: the checkpoint is no longer needed
+    checkpoint.close(finished=True)
+    
+    # Wait for everything still pending before the summary
+    close_notification_queue()
     
     # Final summary
     print(f"\n{'='*70}")
@@ -892,10 +3902,17 @@ def main():
         medium_count = sum(1 for d in all_degraded_responses if d['severity'] == 'MEDIUM')
         print(f"   🔴 High severity: {high_count}")
         print(f"   🟠 Medium severity: {medium_count}")
+    for agent_id, metrics in latency.items():
+        print(f"⏱️  [{agent_id}] {metrics['calls']} calls, total p50/p90/p99: "
+              f"{metrics['total_p50']:.2f}s / {metrics['total_p90']:.2f}s / {metrics['total_p99']:.2f}s")
     print(f"💾 New responses: {NEW_OUTPUT_FILE}")
     if all_degraded_responses:
         print(f"💾 Degraded report: {DEGRADED_OUTPUT_FILE}")
     print("="*70)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        close_notification_queue()
+        close_http_clients()
@@ -0,0 +1,115 @@
+"""
+Circuit breaker against a local fake backend: a short outage must not turn into a whole-sheet failure,
+a dead backend must be short-circuited after a few failed prompts.
+Usage:
+    python test_circuit_breaker.py
+    python -m pytest test_circuit_breaker.py
+"""
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import integrated_test_comparison as kata
+
+PROMPTS = 40
+WORKERS = 4
+THRESHOLD = 3
+PROBE_INTERVAL = 1.0
+
+class FakeBackend:
+    """Answers 503 until recover_at (None: never recovers), then a short SSE answer"""
+
+    def __init__(self, outage_seconds=None):
+        self.recover_at = time.monotonic() + outage_seconds if outage_seconds is not None else None
+        self.calls = 0
+        self.failed_calls = 0
+        self.lock = threading.Lock()
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                down = backend.recover_at is None or time.monotonic() < backend.recover_at
+                with backend.lock:
+                    backend.calls += 1
+                    backend.failed_calls += int(down)
+                if down:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = ('data: ' + json.dumps({'assistant_output': 'recovered answer'}) + '\n\ndata: [DONE]\n\n').encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/chat"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def run_sheet(backend, agent_id):
+    """Send PROMPTS prompts through a fresh breaker for agent_id; returns (results, breaker)"""
+    kata.MAX_RETRIES = 1
+    kata.RETRY_BASE_DELAY = 0.05
+    kata.ENABLE_RATE_LIMIT = False
+    breaker = kata.CircuitBreaker(agent_id, threshold=THRESHOLD, probe_interval=PROBE_INTERVAL)
+    kata._circuit_breakers[agent_id] = breaker
+    jobs = [(row_idx, f"Question {row_idx}") for row_idx in range(1, PROMPTS + 1)]
+    return kata.run_prompts_concurrently(jobs, backend.url, agent_id, WORKERS), breaker
+
+def test_recovers_mid_sheet():
+    """Outage long enough to open the circuit: the probe closes it and the rest of the sheet succeeds"""
+    backend = FakeBackend(outage_seconds=0.5)
+    try:
+        results, breaker = run_sheet(backend, 'breaker-recovers')
+    finally:
+        backend.close()
+
+    failed = [row_idx for row_idx, result in results.items() if result['status'] != 'success']
+    assert breaker.opened_at > 0, "the outage should have opened the circuit"
+    assert breaker.state == 'closed', f"circuit still {breaker.state} after the backend recovered"
+    # Only the prompts that opened the circuit, and final attempts already in flight then, may fail
+    assert len(failed) <= THRESHOLD + WORKERS - 1, f"{len(failed)} prompts failed during a short outage"
+    assert not any(result.get('short_circuited') for result in results.values())
+    print(f"  ✅ Recovered: {PROMPTS - len(failed)}/{PROMPTS} prompts answered, {backend.failed_calls} failed calls")
+
+def test_dead_backend_is_short_circuited():
+    """Backend never recovers: after the failed probe the remaining prompts are not sent"""
+    backend = FakeBackend()
+    try:
+        results, breaker = run_sheet(backend, 'breaker-dead')
+    finally:
+        backend.close()
+
+    short_circuited = sum(1 for result in results.values() if result.get('short_circuited'))
+    assert breaker.down and breaker.state == 'open'
+    assert all(result['status'] == 'error' for result in results.values())
+    assert short_circuited >= PROMPTS - 2 * THRESHOLD - WORKERS, f"only {short_circuited} prompts short-circuited"
+    assert backend.calls <= (THRESHOLD + WORKERS) * (kata.MAX_RETRIES + 1) + 2, f"{backend.calls} calls to a dead backend"
+    print(f"  ✅ Dead backend: {backend.calls} calls, {short_circuited}/{PROMPTS} prompts short-circuited")
+
+if __name__ == "__main__":
+    print('🧪 Circuit breaker tests\n')
+    failures = 0
+    for test in [test_recovers_mid_sheet, test_dead_backend_is_short_circuited]:
+        print(f"▶️  {test.__name__}")
+        try:
+            test()
+        except AssertionError as e:
+            failures += 1
+            print(f"  ❌ {e}")
+    print('\n✅ All circuit breaker tests passed' if not failures else f"\n❌ {failures} test(s) failed")
+    sys.exit(1 if failures else 0)
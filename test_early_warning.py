@@ -0,0 +1,112 @@
+"""
+Early warning against a local fake backend that is down: the first run posts its cards, a second run
+with the agent still down posts no early-warning card again (the outage was already alerted).
+Usage:
+    python test_early_warning.py
+    python -m pytest test_early_warning.py
+"""
+import os
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from openpyxl import Workbook
+
+import integrated_test_comparison as kata
+
+PROMPTS = 30
+WORKERS = 4
+THRESHOLD = 3
+PROBE_INTERVAL = 0.5
+CONFIG = {'name': 'Outage Mentor', 'api_path': '/api/outage', 'agent_id': 'outage', 'max_workers': WORKERS}
+
+class DeadBackend:
+    """Answers every prompt with 503"""
+
+    def __init__(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def outage_workbook():
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['S.No', 'Prompt', 'Response', 'Sources'])
+    for serial in range(1, PROMPTS + 1):
+        ws.append([serial, f"Question {serial}", None, None])
+    return wb
+
+def run_once(backend, benchmark_data, cards):
+    """One run of the sheet against the dead backend, ending with the final alert like run() does"""
+    kata._circuit_breakers[CONFIG['agent_id']] = kata.CircuitBreaker(
+        CONFIG['agent_id'], threshold=THRESHOLD, probe_interval=PROBE_INTERVAL
+    )
+    kata._alert_state = kata.AlertState(kata.ALERT_STATE_FILE)  # Reloaded, as in a new process
+    posted_before = len(cards)
+    degraded, _, _ = kata.process_sheet_with_comparison(1, CONFIG, outage_workbook(), None, benchmark_data)
+    kata.close_notification_queue()
+    kata.send_teams_alert(degraded)
+    return cards[posted_before:]
+
+def test_outage_alerts_once():
+    """The second run of an ongoing outage posts no early-warning card for the short-circuited rows"""
+    state_dir = tempfile.mkdtemp()
+    backend = DeadBackend()
+    cards = []
+    kata.API_BASE_URL = backend.base_url
+    kata.TEAMS_WEBHOOK_URL = backend.base_url + '/webhook'
+    kata.ENABLE_TEAMS_ALERTS = True
+    kata.ENABLE_EARLY_WARNING = True
+    kata.ENABLE_ALERT_DEDUP = True
+    kata.ALERT_STATE_FILE = os.path.join(state_dir, 'kata_alert_state.json')
+    kata.ENABLE_RESULTS_STORE = False
+    kata.RESPONSE_CACHE_MODE = 'off'
+    kata.ENABLE_RATE_LIMIT = False
+    kata.MAX_RETRIES = 1
+    kata.RETRY_BASE_DELAY = 0.05
+    kata.TEST_LIMIT = None
+    kata.post_teams_card = lambda message_card: cards.append(message_card) or True
+    benchmark_data = {
+        serial: {'response': f"A good benchmark answer to question {serial}", 'sources': '', 'quality': 'good'}
+        for serial in range(1, PROMPTS + 1)
+    }
+    try:
+        first = run_once(backend, benchmark_data, cards)
+        second = run_once(backend, benchmark_data, cards)
+    finally:
+        backend.close()
+
+    early_warnings = [card for card in second if card['title'].startswith('🔴 Early Warning')]
+    assert first, "the first run of the outage should have alerted"
+    assert not early_warnings, f"second run re-posted early warning: {[card['title'] for card in early_warnings]}"
+    print(f"  ✅ Outage alerted once: {len(first)} card(s) on the first run, no early warning on the second")
+
+if __name__ == "__main__":
+    print('🧪 Early warning tests\n')
+    failures = 0
+    for test in [test_outage_alerts_once]:
+        print(f"▶️  {test.__name__}")
+        try:
+            test()
+        except AssertionError as e:
+            failures += 1
+            print(f"  ❌ {e}")
+    print('\n✅ All early warning tests passed' if not failures else f"\n❌ {failures} test(s) failed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,279 @@
+"""
+Historical trend dashboard built from the runs recorded in kata_results.sqlite
+Usage:
+    python trend_dashboard.py                         # last 30 runs -> kata_trend_report.html
+    python trend_dashboard.py --runs 60 --output trends.html
+
+Runs are summarized incrementally: each new run is aggregated once into the trend_* tables
+of the results store (per-agent counts and latency percentiles, per-prompt verdict history),
+so a daily invocation only processes the runs added since the previous one.
+"""
+import sys
+import html
+import sqlite3
+import argparse
+from datetime import datetime
+
+from integrated_test_comparison import RESULTS_STORE_FILE, percentile
+
+TREND_REPORT_FILE = "kata_trend_report.html"
+DEFAULT_RUNS = 30
+MAX_VERDICT_HISTORY = 365  # Verdicts kept per prompt, one character per run
+MIN_FLIPS = 2  # A prompt that changes verdict at least this often in the window is flapping
+TOP_PROMPTS = 20
+
+def create_trend_tables(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS trend_processed_runs (
+            run_id TEXT PRIMARY KEY,
+            processed_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS trend_run_agents (
+            run_id TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            agent_id TEXT NOT NULL,
+            sheet_name TEXT NOT NULL,
+            prompts INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            degraded INTEGER NOT NULL,
+            high_severity INTEGER NOT NULL,
+            latency_p50 REAL,
+            latency_p90 REAL,
+            latency_p99 REAL,
+            PRIMARY KEY (run_id, agent_id)
+        );
+        -- verdicts: one character per run, oldest first ('1' degraded, '0' not degraded)
+        CREATE TABLE IF NOT EXISTS trend_prompts (
+            agent_id TEXT NOT NULL,
+            sheet_name TEXT NOT NULL,
+            serial INTEGER NOT NULL,
+            prompt_hash TEXT NOT NULL,
+            verdicts TEXT NOT NULL,
+            last_run_id TEXT NOT NULL,
+            last_reason TEXT,
+            PRIMARY KEY (agent_id, serial)
+        );
+        CREATE INDEX IF NOT EXISTS idx_trend_run_agents_started ON trend_run_agents (started_at);
+    """)
+
+def summarize_new_runs(conn):
+    """Fold every finished run not yet summarized into the trend tables; returns how many were added"""
+    new_runs = conn.execute("""
+        SELECT run_id, started_at FROM runs
+        WHERE finished_at IS NOT NULL AND run_id NOT IN (SELECT run_id FROM trend_processed_runs)
+        ORDER BY started_at
+    """).fetchall()
+
+    # Stores written before agent_findings existed have none to add
+    has_agent_findings = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'agent_findings'"
+    ).fetchone() is not None
+
+    # Verdict history of every prompt, updated in memory and written back once per run
+    history = {
+        (agent_id, serial): (prompt_hash, verdicts)
+        for agent_id, serial, prompt_hash, verdicts in conn.execute(
+            "SELECT agent_id, serial, prompt_hash, verdicts FROM trend_prompts"
+        )
+    }
+
+    for run_id, started_at in new_runs:
+        rows = conn.execute("""
+            SELECT agent_id, sheet_name, serial, prompt_hash, status, latency, degraded, severity, reason
+            FROM results WHERE run_id = ? ORDER BY sheet_number, serial
+        """, (run_id,)).fetchall()
+
+        agents = {}
+        prompt_updates = []
+        for agent_id, sheet_name, serial, prompt_hash, status, latency, degraded, severity, reason in rows:
+            agent = agents.setdefault(agent_id, {
+                'sheet_name': sheet_name, 'prompts': 0, 'errors': 0, 'degraded': 0, 'high': 0, 'latencies': []
+            })
+            agent['prompts'] += 1
+            agent['errors'] += status != 'success'
+            agent['degraded'] += degraded
+            agent['high'] += severity == 'HIGH'
+            if latency is not None:
+                agent['latencies'].append(latency)
+
+            # Append this run's verdict to the prompt's history (restart it if the prompt changed)
+            previous_hash, verdicts = history.get((agent_id, serial), (None, ''))
+            if previous_hash != prompt_hash:
+                verdicts = ''
+            verdicts = (verdicts + ('1' if degraded else '0'))[-MAX_VERDICT_HISTORY:]
+            history[(agent_id, serial)] = (prompt_hash, verdicts)
+            prompt_updates.append((agent_id, sheet_name, serial, prompt_hash, verdicts, run_id, reason))
+
+        # Findings about an agent as a whole (unavailable, p90 latency) count like the ones in runs.degraded
+        if has_agent_findings:
+            for agent_id, sheet_name, severity in conn.execute(
+                "SELECT agent_id, sheet_name, severity FROM agent_findings WHERE run_id = ?", (run_id,)
+            ):
+                agent = agents.setdefault(agent_id, {
+                    'sheet_name': sheet_name, 'prompts': 0, 'errors': 0, 'degraded': 0, 'high': 0, 'latencies': []
+                })
+                agent['degraded'] += 1
+                agent['high'] += severity == 'HIGH'
+
+        conn.executemany("INSERT OR REPLACE INTO trend_prompts VALUES (?, ?, ?, ?, ?, ?, ?)", prompt_updates)
+        for agent_id, agent in agents.items():
+            latencies = sorted(agent['latencies'])
+            conn.execute(
+                "INSERT OR REPLACE INTO trend_run_agents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, started_at, agent_id, agent['sheet_name'], agent['prompts'], agent['errors'],
+                 agent['degraded'], agent['high'],
+                 percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 99))
+            )
+
+        conn.execute("INSERT INTO trend_processed_runs VALUES (?, ?)",
+                     (run_id, datetime.now().isoformat(timespec='seconds')))
+        conn.commit()
+
+    return len(new_runs)
+
+def count_flips(verdicts):
+    return sum(1 for previous, current in zip(verdicts, verdicts[1:]) if previous != current)
+
+def load_trends(conn, runs):
+    """Per-agent rows of the last `runs` runs, plus flapping and persistently degraded prompts"""
+    recent_runs = [run_id for (run_id,) in conn.execute(
+        "SELECT run_id FROM trend_processed_runs JOIN runs USING (run_id) ORDER BY started_at DESC LIMIT ?",
+        (runs,)
+    )]
+    recent_runs.reverse()
+
+    agent_rows = {}
+    if recent_runs:
+        placeholders = ', '.join('?' * len(recent_runs))
+        for row in conn.execute(f"""
+            SELECT run_id, started_at, agent_id, sheet_name, prompts, errors, degraded, high_severity,
+                   latency_p50, latency_p90, latency_p99
+            FROM trend_run_agents WHERE run_id IN ({placeholders}) ORDER BY started_at
+        """, recent_runs):
+            agent_rows.setdefault(row[3], []).append(row)
+
+    flapping = []
+    persistent = []
+    for agent_id, sheet_name, serial, verdicts, last_reason in conn.execute(
+        "SELECT agent_id, sheet_name, serial, verdicts, last_reason FROM trend_prompts"
+    ):
+        window = verdicts[-runs:]
+        flips = count_flips(window)
+        if flips >= MIN_FLIPS:
+            flapping.append((flips, window.count('1'), sheet_name, serial, window))
+
+        streak = len(window) - len(window.rstrip('1'))
+        if streak >= 2:
+            persistent.append((streak, sheet_name, serial, window, last_reason))
+
+    flapping.sort(key=lambda entry: (-entry[0], -entry[1], entry[2], entry[3]))
+    persistent.sort(key=lambda entry: (-entry[0], entry[1], entry[2]))
+    return recent_runs, agent_rows, flapping[:TOP_PROMPTS], persistent[:TOP_PROMPTS]
+
+def format_seconds(value):
+    return "—" if value is None else f"{value:.2f}s"
+
+def sparkline(values, width=160, height=28):
+    """Inline SVG polyline of a series of counts"""
+    if len(values) < 2:
+        return ""
+    top = max(values) or 1
+    step = width / (len(values) - 1)
+    points = ' '.join(f"{i * step:.1f},{height - 2 - (value / top) * (height - 4):.1f}" for i, value in enumerate(values))
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<polyline fill="none" stroke="#C00000" stroke-width="1.5" points="{points}"/></svg>')
+
+def verdict_strip(window):
+    """One colored cell per run: red degraded, green not degraded"""
+    return ''.join(f'<span class="v{verdict}"></span>' for verdict in window)
+
+def render_html(recent_runs, agent_rows, flapping, persistent):
+    esc = html.escape
+    parts = [f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>KATA trend report</title>
+<style>
+body {{ font-family: Segoe UI, Arial, sans-serif; margin: 24px; color: #222; }}
+table {{ border-collapse: collapse; margin-bottom: 24px; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: right; }}
+th {{ background: #C00000; color: #fff; }}
+td.text {{ text-align: left; }}
+span.v0, span.v1 {{ display: inline-block; width: 6px; height: 14px; margin-right: 1px; }}
+span.v0 {{ background: #C6EFCE; }}
+span.v1 {{ background: #FFC7CE; }}
+</style></head><body>
+<h1>KATA trend report</h1>
+<p>Last {len(recent_runs)} runs &middot; generated {datetime.now().strftime('%Y-%m-%d %H:%M')}</p>
+"""]
+
+    parts.append("<h2>Agents</h2>")
+    for sheet_name, rows in sorted(agent_rows.items()):
+        latest = rows[-1]
+        parts.append(f"<h3>{esc(sheet_name)} {sparkline([row[6] for row in rows])}</h3>")
+        parts.append(f"<p>Latest run: {latest[6]} degraded ({latest[7]} HIGH) of {latest[4]} prompts, "
+                     f"latency p50 {format_seconds(latest[8])}, p90 {format_seconds(latest[9])}, "
+                     f"p99 {format_seconds(latest[10])}</p>")
+        parts.append("<table><tr><th>Run</th><th>Prompts</th><th>Errors</th><th>Degraded</th><th>HIGH</th>"
+                     "<th>p50</th><th>p90</th><th>p99</th></tr>")
+        for run_id, started_at, _, _, prompts, errors, degraded, high, p50, p90, p99 in reversed(rows):
+            parts.append(f'<tr><td class="text">{esc(started_at)}</td><td>{prompts}</td><td>{errors}</td>'
+                         f"<td>{degraded}</td><td>{high}</td><td>{format_seconds(p50)}</td>"
+                         f"<td>{format_seconds(p90)}</td><td>{format_seconds(p99)}</td></tr>")
+        parts.append("</table>")
+
+    parts.append(f"<h2>Flapping prompts (verdict changed {MIN_FLIPS}+ times)</h2>")
+    if flapping:
+        parts.append("<table><tr><th>Agent</th><th>Serial</th><th>Flips</th><th>Degraded runs</th><th>History</th></tr>")
+        for flips, degraded_runs, sheet_name, serial, window in flapping:
+            parts.append(f'<tr><td class="text">{esc(sheet_name)}</td><td>{serial}</td><td>{flips}</td>'
+                         f'<td>{degraded_runs}</td><td class="text">{verdict_strip(window)}</td></tr>')
+        parts.append("</table>")
+    else:
+        parts.append("<p>None</p>")
+
+    parts.append("<h2>Persistently degraded prompts (latest runs in a row)</h2>")
+    if persistent:
+        parts.append("<table><tr><th>Agent</th><th>Serial</th><th>Runs in a row</th><th>History</th><th>Latest reason</th></tr>")
+        for streak, sheet_name, serial, window, last_reason in persistent:
+            parts.append(f'<tr><td class="text">{esc(sheet_name)}</td><td>{serial}</td><td>{streak}</td>'
+                         f'<td class="text">{verdict_strip(window)}</td><td class="text">{esc(last_reason or "")}</td></tr>')
+        parts.append("</table>")
+    else:
+        parts.append("<p>None</p>")
+
+    parts.append("</body></html>\n")
+    return '\n'.join(parts)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the KATA trend report from stored runs")
+    parser.add_argument('--db', default=RESULTS_STORE_FILE, help="Results store (default: %(default)s)")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help="Number of recent runs to show")
+    parser.add_argument('--output', default=TREND_REPORT_FILE, help="HTML file to write (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    print("="*70)
+    print("📈 KATA trend report")
+    print("="*70)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if not conn.execute("SELECT name FROM sqlite_master WHERE name = 'runs'").fetchone():
+            print(f"❌ No runs recorded in {args.db}")
+            return 1
+
+        create_trend_tables(conn)
+        added = summarize_new_runs(conn)
+        print(f"🧮 Summarized {added} new run(s)")
+
+        recent_runs, agent_rows, flapping, persistent = load_trends(conn, args.runs)
+    finally:
+        conn.close()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(render_html(recent_runs, agent_rows, flapping, persistent))
+
+    print(f"📊 {len(recent_runs)} runs, {len(flapping)} flapping and {len(persistent)} persistently degraded prompts")
+    print(f"💾 Trend report saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())